@@ -0,0 +1,160 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from model import CompiledNetwork, _chunks, load_network, read_evidence
+from sampling import Sampler
+
+
+# CPDs of a fixed network structure learned from a stream of observations.
+# Each CPD keeps a table of counts per parent configuration and is estimated
+# as the posterior mean under a Dirichlet prior of prior pseudo-counts per
+# state. With decay < 1 every observation scales the earlier counts of its own
+# parent configuration by decay, so the estimates follow drifting traffic with
+# an effective memory of about 1 / (1 - decay) observations per parent
+# configuration, and rare configurations keep their counts until seen again.
+class OnlineCPDs:
+    def __init__(self, structure, state_names, prior=1.0, decay=1.0):
+        # structure: (variable, parents) pairs
+        self.structure = [(variable, list(parents)) for variable, parents in structure]
+        self.variables = [variable for variable, _ in self.structure]
+        self.state_names = state_names
+        self.prior = prior
+        self.decay = decay
+        self.codes = {variable: {state: code for code, state in enumerate(state_names[variable])} for variable in self.variables}
+        self.counts = {
+            variable: np.zeros([len(state_names[name]) for name in [variable, *parents]])
+            for variable, parents in self.structure
+        }
+        self.observations = 0
+
+    @classmethod
+    def from_network(cls, network, prior=1.0, decay=1.0, strength=0.0):
+        """Takes the structure of a CompiledNetwork; with strength > 0 its CPDs also
+        start as that many pseudo-observations per parent configuration."""
+        learner = cls([(variables[0], variables[1:]) for variables, _ in network.cpds], network.state_names, prior, decay)
+        for variables, values in network.cpds:
+            learner.counts[variables[0]] += strength * values
+        return learner
+
+    def encode(self, records):
+        """Turns records (dicts of variable -> state name) into an (n, variables) array
+        of state codes, with -1 where a value is missing (absent, None, "" or NaN)."""
+        records = list(records)
+        codes = np.full((len(records), len(self.variables)), -1, dtype=np.intp)
+        for column, variable in enumerate(self.variables):
+            states = self.codes[variable]
+            for row, record in enumerate(records):
+                value = record.get(variable)
+                if value is None or value == "" or value != value:
+                    continue
+                code = states.get(str(value).strip().lower())
+                if code is None:
+                    raise ValueError(f"unknown {variable} state {value!r}")
+                codes[row, column] = code
+        return codes
+
+    def update(self, rows):
+        """Adds a batch of observations: records, or an (n, variables) array of state
+        codes in self.variables order. Each CPD only counts the rows in which its
+        variable and all of its parents are observed."""
+        codes = rows if isinstance(rows, np.ndarray) and rows.dtype.kind == "i" else self.encode(rows)
+        n = len(codes)
+        if not n:
+            return
+        column = {variable: i for i, variable in enumerate(self.variables)}
+        for variable, parents in self.structure:
+            counts = self.counts[variable]
+            family = codes[:, [column[name] for name in [variable, *parents]]]
+            family = family[(family >= 0).all(axis=1)]
+            flat = np.ravel_multi_index(tuple(family.T), counts.shape)
+            if self.decay < 1:
+                # A row is decayed by the later rows of the batch in its parent
+                # configuration, and each configuration's earlier counts by all
+                # of its rows
+                table = counts.reshape(len(counts), -1)
+                configuration = flat % table.shape[1]
+                seen = np.bincount(configuration, minlength=table.shape[1])
+                order = np.argsort(configuration, kind="stable")
+                rank = np.empty(len(order), dtype=np.intp)
+                ordered = configuration[order]
+                rank[order] = np.arange(len(order)) - np.searchsorted(ordered, ordered)
+                table *= self.decay ** seen
+                weights = self.decay ** (seen[configuration] - 1 - rank)
+            else:
+                weights = None
+            counts += np.bincount(flat, weights=weights, minlength=counts.size).reshape(counts.shape)
+        self.observations += n
+
+    def cpds(self):
+        """Returns the current estimates as (variables, values) pairs."""
+        estimates = []
+        for variable, parents in self.structure:
+            counts = self.counts[variable] + self.prior
+            estimates.append(([variable, *parents], counts / counts.sum(axis=0, keepdims=True)))
+        return estimates
+
+    def network(self):
+        """The estimates as a CompiledNetwork, for exact queries on small networks."""
+        return CompiledNetwork(self.cpds(), self.state_names)
+
+    def sampler(self):
+        """The estimates as a Sampler, for approximate queries on large networks."""
+        return Sampler(self.cpds(), self.state_names)
+
+
+# Largest absolute difference between two lists of (variables, values) CPDs
+# over the same structure
+def cpd_error(cpds, reference):
+    reference = {variables[0]: values for variables, values in reference}
+    return max(np.abs(values - reference[variables[0]]).max() for variables, values in cpds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Learn the congestion CPDs from streamed observations.")
+    parser.add_argument("inputs", nargs="*", default=["-"], help="CSV or JSON Lines files, - for stdin")
+    parser.add_argument("--format", choices=["auto", "csv", "jsonl"], default="auto", help="input format")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--prior", type=float, default=1.0, help="Dirichlet pseudo-count per state")
+    parser.add_argument("--decay", type=float, default=1.0, help="weight kept by earlier counts per observation")
+    parser.add_argument("--strength", type=float, default=0.0,
+                        help="pseudo-observations per parent configuration taken from the current model")
+    parser.add_argument("--output", default=None, help="write the learned model artifact here")
+    parser.add_argument("--simulate", type=int, default=0,
+                        help="learn from this many seeded samples of the current model instead of inputs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    network = load_network()
+    learner = OnlineCPDs.from_network(network, args.prior, args.decay, args.strength)
+    start_time = time.perf_counter()
+
+    if args.simulate:
+        sampler = Sampler.from_network(network)
+        rng = np.random.default_rng(args.seed)
+        for start in range(0, args.simulate, args.chunk_size):
+            drawn = sampler.sample(min(args.chunk_size, args.simulate - start), rng)
+            learner.update(np.column_stack([drawn[variable] for variable in learner.variables]))
+            print(f"{learner.observations:>10} observations: max CPD error {cpd_error(learner.cpds(), network.cpds):.5f}",
+                  file=sys.stderr)
+    else:
+        for path in args.inputs:
+            file = sys.stdin if path == "-" else open(path, newline="")
+            try:
+                for chunk in _chunks(read_evidence(file, args.format), args.chunk_size):
+                    learner.update(chunk)
+            finally:
+                if file is not sys.stdin:
+                    file.close()
+
+    seconds = time.perf_counter() - start_time
+    rate = learner.observations / seconds if seconds else float("inf")
+    print(f"Learned from {learner.observations} observations in {seconds:.2f} s ({rate:.0f} rows/s)", file=sys.stderr)
+    if args.output:
+        learner.network().save(args.output)
+
+
+if __name__ == "__main__":
+    main()
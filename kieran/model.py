@@ -1,111 +1,430 @@
-from pgmpy.models import BayesianNetwork
-from pgmpy.factors.discrete import TabularCPD
-from pgmpy.inference import VariableElimination
-
-# Define the Bayesian Network structure
-model = BayesianNetwork([
-    ("weather", "historical_congestion_level"),
-    ("time_of_day", "historical_congestion_level"),
-    ("accident", "historical_congestion_level"),  
-    ("historical_congestion_level", "current_congestion_level")
-])
-
-# Define CPDs
-cpd_weather = TabularCPD(variable="weather", variable_card=3,
-                         values=[[0.7], [0.26], [0.04]],
-                         state_names={"weather": ["sunny", "rainy", "foggy"]})
-
-cpd_time_of_day = TabularCPD(variable="time_of_day", variable_card=3,
-                             values=[[0.34], [0.33], [0.33]],
-                             state_names={"time_of_day": ["morning", "afternoon", "evening"]})
-
-cpd_accident = TabularCPD(variable="accident", variable_card=2,
-                           values=[[0.85], [0.15]],  # 85% No accident, 15% Accident
-                           state_names={"accident": ["no", "yes"]})
-
-# Updated CPD for historical_congestion_level
-cpd_historical = TabularCPD(
-    variable="historical_congestion_level",
-    variable_card=3,
-    values=[
-       
-       # LOW
-       [
-         0.80, 0.10, 0.80, 0.10, 0.90, 0.15,  # sunny-morning/afternoon/evening x accident=[no,yes]
-         0.60, 0.05, 0.60, 0.05, 0.70, 0.10,  # rainy-morning/afternoon/evening x accident=[no,yes]
-         0.70, 0.10, 0.70, 0.10, 0.80, 0.15   # foggy-morning/afternoon/evening x accident=[no,yes]
-       ],
-       # MEDIUM
-       [
-         0.15, 0.20, 0.15, 0.20, 0.08, 0.25,
-         0.25, 0.15, 0.25, 0.15, 0.20, 0.20,
-         0.20, 0.15, 0.20, 0.15, 0.15, 0.20
-       ],
-       # HIGH
-       [
-         0.05, 0.70, 0.05, 0.70, 0.02, 0.60,
-         0.15, 0.80, 0.15, 0.80, 0.10, 0.70,
-         0.10, 0.75, 0.10, 0.75, 0.05, 0.65
-       ]
-    ],
-    evidence=["weather", "time_of_day", "accident"],
-    evidence_card=[3, 3, 2],
-    state_names={
-        "historical_congestion_level": ["low", "medium", "high"],
-        "weather": ["sunny", "rainy", "foggy"],
-        "time_of_day": ["morning", "afternoon", "evening"],
-        "accident": ["no", "yes"]
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Evidence columns of a batch, in order
+EVIDENCE_VARIABLES = ("weather", "time_of_day", "accident")
+
+# Compiled model saved next to this file; queries load it without pgmpy
+ARTIFACT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "congestion_model.npz")
+ARTIFACT_VERSION = 1
+
+# Build the congestion Bayesian network
+def build_model():
+    # pgmpy (with pandas, networkx and torch behind it) is only imported to
+    # build or validate the model, never to answer queries
+    from pgmpy.models import BayesianNetwork
+    from pgmpy.factors.discrete import TabularCPD
+
+    # Define the Bayesian Network structure
+    model = BayesianNetwork([
+        ("weather", "historical_congestion_level"),
+        ("time_of_day", "historical_congestion_level"),
+        ("accident", "historical_congestion_level"),  
+        ("historical_congestion_level", "current_congestion_level")
+    ])
+
+    # Define CPDs
+    cpd_weather = TabularCPD(variable="weather", variable_card=3,
+                             values=[[0.7], [0.26], [0.04]],
+                             state_names={"weather": ["sunny", "rainy", "foggy"]})
+
+    cpd_time_of_day = TabularCPD(variable="time_of_day", variable_card=3,
+                                 values=[[0.34], [0.33], [0.33]],
+                                 state_names={"time_of_day": ["morning", "afternoon", "evening"]})
+
+    cpd_accident = TabularCPD(variable="accident", variable_card=2,
+                               values=[[0.85], [0.15]],  # 85% No accident, 15% Accident
+                               state_names={"accident": ["no", "yes"]})
+
+    # Updated CPD for historical_congestion_level
+    cpd_historical = TabularCPD(
+        variable="historical_congestion_level",
+        variable_card=3,
+        values=[
+
+           # LOW
+           [
+             0.80, 0.10, 0.80, 0.10, 0.90, 0.15,  # sunny-morning/afternoon/evening x accident=[no,yes]
+             0.60, 0.05, 0.60, 0.05, 0.70, 0.10,  # rainy-morning/afternoon/evening x accident=[no,yes]
+             0.70, 0.10, 0.70, 0.10, 0.80, 0.15   # foggy-morning/afternoon/evening x accident=[no,yes]
+           ],
+           # MEDIUM
+           [
+             0.15, 0.20, 0.15, 0.20, 0.08, 0.25,
+             0.25, 0.15, 0.25, 0.15, 0.20, 0.20,
+             0.20, 0.15, 0.20, 0.15, 0.15, 0.20
+           ],
+           # HIGH
+           [
+             0.05, 0.70, 0.05, 0.70, 0.02, 0.60,
+             0.15, 0.80, 0.15, 0.80, 0.10, 0.70,
+             0.10, 0.75, 0.10, 0.75, 0.05, 0.65
+           ]
+        ],
+        evidence=["weather", "time_of_day", "accident"],
+        evidence_card=[3, 3, 2],
+        state_names={
+            "historical_congestion_level": ["low", "medium", "high"],
+            "weather": ["sunny", "rainy", "foggy"],
+            "time_of_day": ["morning", "afternoon", "evening"],
+            "accident": ["no", "yes"]
+        }
+    )
+
+    cpd_current = TabularCPD(
+        variable="current_congestion_level",
+        variable_card=3,
+        values=[
+            [0.5, 0.25, 0.1],  # P(current=low | historical=low/medium/high)
+            [0.4, 0.5, 0.4],  # P(current=medium | historical=low/medium/high)
+            [0.1, 0.25, 0.5]   # P(current=high | historical=low/medium/high)
+        ],
+        evidence=["historical_congestion_level"],
+        evidence_card=[3],
+        state_names={
+            "current_congestion_level": ["low", "medium", "high"],
+            "historical_congestion_level": ["low", "medium", "high"]
+        }
+    )
+
+    # Add CPDs to the model
+    model.add_cpds(cpd_weather, cpd_time_of_day, cpd_accident, cpd_historical, cpd_current)
+
+    # Check the model structure
+    assert model.check_model()
+
+    return model
+
+
+# Query the posterior of current_congestion_level; evidence left as None is
+# marginalized out. inference is a pgmpy inference object or a CompiledNetwork.
+def congestion_posterior(inference, weather=None, time_of_day=None, accident=None):
+    if isinstance(inference, CompiledNetwork):
+        posterior = inference.batch_posterior([(weather, time_of_day, accident)])[0]
+        return dict(zip(inference.state_names["current_congestion_level"], posterior.tolist()))
+
+    evidence = {
+        name: value
+        for name, value in (("weather", weather), ("time_of_day", time_of_day), ("accident", accident))
+        if value is not None
     }
-)
-
-cpd_current = TabularCPD(
-    variable="current_congestion_level",
-    variable_card=3,
-    values=[
-        [0.5, 0.25, 0.1],  # P(current=low | historical=low/medium/high)
-        [0.4, 0.5, 0.4],  # P(current=medium | historical=low/medium/high)
-        [0.1, 0.25, 0.5]   # P(current=high | historical=low/medium/high)
-    ],
-    evidence=["historical_congestion_level"],
-    evidence_card=[3],
-    state_names={
-        "current_congestion_level": ["low", "medium", "high"],
-        "historical_congestion_level": ["low", "medium", "high"]
+    query_result = inference.query(variables=["current_congestion_level"], evidence=evidence)
+    return {
+        query_result.state_names["current_congestion_level"][state]: float(prob)
+        for state, prob in enumerate(query_result.values)
     }
-)
-
-# Add CPDs to the model
-model.add_cpds(cpd_weather, cpd_time_of_day, cpd_accident, cpd_historical, cpd_current)
-
-# Check the model structure
-assert model.check_model()
-
-# Perform inference
-inference = VariableElimination(model)
-
-# User input
-weather_input = input("Enter the weather (sunny, rainy, foggy): ").strip().lower()
-time_of_day_input = input("Enter the time of day (morning, afternoon, evening): ").strip().lower()
-accident_input = input("Is there an accident? (yes, no): ").strip().lower()
-
-# Validate input
-if (weather_input not in ["sunny", "rainy", "foggy"] or 
-    time_of_day_input not in ["morning", "afternoon", "evening"] or 
-    accident_input not in ["yes", "no"]):
-    print("Invalid input. Please enter valid weather, time of day, and accident status.")
-else:
-    # Query the model
-    query_result = inference.query(
-        variables=["current_congestion_level"],
-        evidence={
-            "weather": weather_input, 
-            "time_of_day": time_of_day_input, 
-            "accident": accident_input
+
+
+# The network compiled into NumPy: the CPD tensors with the state names of
+# every variable, multiplied out into one joint probability tensor. The joint
+# has only 3 * 3 * 2 * 3 * 3 = 162 entries here, so conditioning on any
+# evidence pattern is a single einsum over it.
+class CompiledNetwork:
+    def __init__(self, cpds, state_names):
+        # cpds: (variables, values) pairs, values indexed in variables order
+        # with the CPD's own variable first
+        self.cpds = [(list(variables), np.asarray(values, dtype=np.float64)) for variables, values in cpds]
+        self.variables = [variables[0] for variables, _ in self.cpds]
+        self.state_names = state_names
+        axis = {variable: i for i, variable in enumerate(self.variables)}
+        operands = []
+        for variables, values in self.cpds:
+            operands += [values, [axis[variable] for variable in variables]]
+        self.joint = np.einsum(*operands, list(range(len(self.variables))))
+        self.tables = {}  # (query, evidence variables) -> posterior table
+
+    @classmethod
+    def from_model(cls, model):
+        cpds = model.get_cpds()
+        state_names = {cpd.variable: list(cpd.state_names[cpd.variable]) for cpd in cpds}
+        return cls([(cpd.variables, cpd.values) for cpd in cpds], state_names)
+
+    def save(self, path):
+        """Writes the CPD tensors and state names to an .npz file."""
+        metadata = {
+            "version": ARTIFACT_VERSION,
+            "cpds": [variables for variables, _ in self.cpds],
+            "state_names": self.state_names,
         }
-    )
+        arrays = {f"cpd{i}": values for i, (_, values) in enumerate(self.cpds)}
+        with open(path, "wb") as file:
+            np.savez_compressed(file, metadata=np.array(json.dumps(metadata)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a file written by save(); needs NumPy only."""
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            if metadata.get("version") != ARTIFACT_VERSION:
+                raise ValueError(f"unsupported congestion model format in {path}")
+            cpds = [(variables, data[f"cpd{i}"]) for i, variables in enumerate(metadata["cpds"])]
+        return cls(cpds, metadata["state_names"])
+
+    def posterior_table(self, query="current_congestion_level", evidence=EVIDENCE_VARIABLES):
+        """Returns P(query | evidence) for every evidence pattern at once, as an array indexed
+        by one code per evidence variable (its state index, or its cardinality when missing)
+        and then by the query state."""
+        key = (query, tuple(evidence))
+        if key not in self.tables:
+            operands = [self.joint, list(range(len(self.variables)))]
+            output = []
+            for i, variable in enumerate(evidence):
+                card = len(self.state_names[variable])
+                # One row per observed state, plus an all-ones row for "missing"
+                indicators = np.vstack([np.eye(card), np.ones(card)])
+                pattern = len(self.variables) + i
+                operands += [indicators, [pattern, self.variables.index(variable)]]
+                output.append(pattern)
+            output.append(self.variables.index(query))
+            table = np.einsum(*operands, output, optimize=True)
+            self.tables[key] = table / table.sum(axis=-1, keepdims=True)
+        return self.tables[key]
+
+    def encode(self, rows, evidence=EVIDENCE_VARIABLES):
+        """Turns evidence rows (sequences of state names, with None, "" or NaN for missing
+        values) into an integer array of state codes, one column per evidence variable."""
+        rows = np.asarray(rows, dtype=object).reshape(-1, len(evidence))
+        codes = np.empty(rows.shape, dtype=np.intp)
+        for column, variable in enumerate(evidence):
+            values = rows[:, column]
+            states = self.state_names[variable]
+            missing = np.array([value is None or value == "" or value != value for value in values], dtype=bool)
+            code = np.full(len(values), len(states), dtype=np.intp)
+            matched = missing.copy()
+            for state, name in enumerate(states):
+                hit = values == name
+                code[hit] = state
+                matched |= hit
+            if not matched.all():
+                raise ValueError(f"unknown {variable} state {values[~matched][0]!r}")
+            codes[:, column] = code
+        return codes
+
+    def batch_posterior(self, rows, query="current_congestion_level", evidence=EVIDENCE_VARIABLES):
+        """Returns an (n, states) array with P(query | row) for every evidence row."""
+        codes = rows if isinstance(rows, np.ndarray) and rows.dtype.kind == "i" else self.encode(rows, evidence)
+        table = self.posterior_table(query, evidence)
+        return table[tuple(codes.T)]
+
+
+# Loads the compiled model artifact, or rebuilds it with pgmpy (and saves it)
+# when it is missing or rebuild is set
+def load_network(path=ARTIFACT, rebuild=False):
+    if not rebuild and os.path.exists(path):
+        return CompiledNetwork.load(path)
+    network = CompiledNetwork.from_model(build_model())
+    network.save(path)
+    return network
+
+
+# Compares every evidence pattern of a compiled network against pgmpy's
+# VariableElimination; returns the largest absolute difference
+def validate_network(network, model=None):
+    from pgmpy.inference import VariableElimination
+
+    inference = VariableElimination(model if model is not None else build_model())
+    states = network.state_names["current_congestion_level"]
+    patterns = list(itertools.product(*[[None] + network.state_names[variable] for variable in EVIDENCE_VARIABLES]))
+    compiled = network.batch_posterior(patterns)
+    error = 0.0
+    for pattern, posterior in zip(patterns, compiled):
+        exact = congestion_posterior(inference, *pattern)
+        error = max(error, max(abs(exact[state] - p) for state, p in zip(states, posterior)))
+    return error
+
+
+def interactive(network):
+    # User input
+    weather_input = input("Enter the weather (sunny, rainy, foggy): ").strip().lower()
+    time_of_day_input = input("Enter the time of day (morning, afternoon, evening): ").strip().lower()
+    accident_input = input("Is there an accident? (yes, no): ").strip().lower()
+
+    # Validate input
+    if (weather_input not in ["sunny", "rainy", "foggy"] or 
+        time_of_day_input not in ["morning", "afternoon", "evening"] or 
+        accident_input not in ["yes", "no"]):
+        print("Invalid input. Please enter valid weather, time of day, and accident status.")
+    else:
+        # Query the model
+        posterior = congestion_posterior(network, weather_input, time_of_day_input, accident_input)
+
+        # Print results
+        print("\nPredicted probabilities for Current Congestion Level:")
+        for state_name, prob in posterior.items():
+            print(f"  {state_name}: {prob:.4f}")
+
+
+# Yields evidence records (dicts) from a CSV file with a header row or from
+# a JSON Lines file; fmt "auto" picks JSON Lines when the first line starts with "{"
+def read_evidence(file, fmt="auto"):
+    first = file.readline()
+    if fmt == "auto":
+        fmt = "jsonl" if first.lstrip().startswith("{") else "csv"
+    lines = itertools.chain([first], file)
+    if fmt == "csv":
+        yield from csv.DictReader(lines)
+    else:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _evidence_value(value):
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    return value or None
+
+
+# Writes scored rows as CSV. The header is fields (the first row's fields by
+# default) plus the posterior columns, written once however many inputs are
+# streamed through it. Fields outside the header are dropped with a warning
+# the first time each one shows up.
+class CSVRows:
+    def __init__(self, output, columns, fields=None):
+        self.output = output
+        self.columns = columns
+        self.fields = fields
+        self.writer = None
+        self.checked = set()  # Field tuples already compared with the header
+        self.dropped = set()
+
+    def writerow(self, record, row):
+        if self.writer is None:
+            fields = list(record) if self.fields is None else list(self.fields)
+            self.writer = csv.DictWriter(self.output, fieldnames=fields + self.columns, extrasaction="ignore")
+            self.writer.writeheader()
+        keys = tuple(record)
+        if keys not in self.checked:
+            self.checked.add(keys)
+            extra = [key for key in keys if key not in self.writer.fieldnames and key not in self.dropped]
+            if extra:
+                print(f"dropping fields missing from the CSV header: {', '.join(extra)}", file=sys.stderr)
+                self.dropped.update(extra)
+        self.writer.writerow(row)
+
+
+def _posterior_columns(network):
+    return [f"p_{state}" for state in network.state_names["current_congestion_level"]]
+
+
+# Streams evidence records through the compiled network chunk_size at a time
+# and writes each record back with one p_<state> column per congestion level.
+# Posteriors are memoized per evidence tuple, so at most one batch query per
+# chunk reaches the network; rows with unknown states are skipped and counted
+# but never memoized, so bad input cannot grow the memo. Pass the same memo
+# and CSVRows writer for every input of one output. Returns a stats dict.
+def score_stream(records, output, network, fmt="jsonl", chunk_size=10000, memo=None, writer=None):
+    columns = _posterior_columns(network)
+    memo = {} if memo is None else memo  # Evidence tuple -> posterior row
+    if fmt == "csv" and writer is None:
+        writer = CSVRows(output, columns)
+    stats = {"rows": 0, "invalid": 0}
+    start_time = time.perf_counter()
+
+    for chunk in _chunks(records, chunk_size):
+        evidence = [
+            tuple(_evidence_value(record.get(variable)) for variable in EVIDENCE_VARIABLES)
+            for record in chunk
+        ]
+        unseen = [key for key in dict.fromkeys(evidence) if key not in memo]
+        invalid = set()
+        if unseen:
+            try:
+                memo.update(zip(unseen, network.batch_posterior(unseen).tolist()))
+            except ValueError:
+                # Find the bad tuples one by one; this only happens for new evidence
+                for key in unseen:
+                    try:
+                        memo[key] = network.batch_posterior([key])[0].tolist()
+                    except ValueError as error:
+                        print(f"skipping evidence {key}: {error}", file=sys.stderr)
+                        invalid.add(key)
+
+        for record, key in zip(chunk, evidence):
+            if key in invalid:
+                stats["invalid"] += 1
+                continue
+            row = dict(record)
+            row.update(zip(columns, memo[key]))
+            if fmt == "csv":
+                writer.writerow(record, row)
+            else:
+                output.write(json.dumps(row) + "\n")
+            stats["rows"] += 1
+
+    stats["seconds"] = time.perf_counter() - start_time
+    stats["distinct_evidence"] = len(memo)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score congestion evidence with the Bayesian network.")
+    parser.add_argument("inputs", nargs="*", default=["-"], help="CSV or JSON Lines files, - for stdin")
+    parser.add_argument("--format", choices=["auto", "csv", "jsonl"], default="auto", help="input format")
+    parser.add_argument("--output", default="-", help="output file, - for stdout")
+    parser.add_argument("--output-format", choices=["csv", "jsonl"], default="jsonl")
+    parser.add_argument("--fields", help="comma-separated input fields for CSV output (default: the first record's)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--interactive", action="store_true", help="prompt for one evidence combination")
+    parser.add_argument("--model", default=ARTIFACT, help="compiled model artifact")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the artifact with pgmpy")
+    parser.add_argument("--validate", action="store_true", help="check the artifact against pgmpy and exit")
+    args = parser.parse_args(argv)
+
+    network = load_network(args.model, args.rebuild)
+    if args.validate:
+        error = validate_network(network)
+        print(f"Largest difference from VariableElimination: {error:.3g}")
+        sys.exit(0 if error < 1e-9 else 1)
+    if args.interactive:
+        interactive(network)
+        return
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    totals = {"rows": 0, "invalid": 0, "seconds": 0.0}
+    memo = {}
+    writer = None
+    if args.output_format == "csv":
+        fields = args.fields.split(",") if args.fields else None
+        writer = CSVRows(output, _posterior_columns(network), fields)
+    try:
+        for path in args.inputs:
+            file = sys.stdin if path == "-" else open(path, newline="")
+            try:
+                stats = score_stream(read_evidence(file, args.format), output, network, args.output_format,
+                                     args.chunk_size, memo, writer)
+            finally:
+                if file is not sys.stdin:
+                    file.close()
+            for key in totals:
+                totals[key] += stats[key]
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    rate = totals["rows"] / totals["seconds"] if totals["seconds"] else float("inf")
+    print(f"Scored {totals['rows']} rows in {totals['seconds']:.2f} s ({rate:.0f} rows/s), "
+          f"{totals['invalid']} invalid, {len(memo)} distinct evidence tuples", file=sys.stderr)
+
 
-    # Print results
-    print("\nPredicted probabilities for Current Congestion Level:")
-    for state, prob in enumerate(query_result.values):
-        state_name = query_result.state_names["current_congestion_level"][state]
-        print(f"  {state_name}: {prob:.4f}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
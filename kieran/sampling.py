@@ -0,0 +1,273 @@
+import argparse
+import time
+
+import numpy as np
+
+from model import load_network
+
+
+# Orders the variables of cpds ((variables, values) pairs, the CPD's own
+# variable first) so that every variable comes after its parents
+def topological_order(cpds):
+    parents = {variables[0]: list(variables[1:]) for variables, _ in cpds}
+    order = []
+    placed = set()
+    while len(order) < len(parents):
+        ready = [variable for variable in parents if variable not in placed and placed.issuperset(parents[variable])]
+        if not ready:
+            raise ValueError("the network has a cycle or a parent without a CPD")
+        order += ready
+        placed.update(ready)
+    return order
+
+
+# Draws one state code per column of an (states, n) array of unnormalized
+# probabilities, given n uniform numbers in [0, 1)
+def _choose(probabilities, uniform):
+    cumulative = np.cumsum(probabilities, axis=0)
+    return (cumulative <= uniform * cumulative[-1]).sum(axis=0)
+
+
+# Approximate inference over the CPD tensors of a discrete Bayesian network.
+# Every method moves a whole batch of samples (or a whole population of Gibbs
+# chains) through one NumPy operation per variable, so the cost grows with
+# the number of variables instead of with the size of the elimination
+# cliques. Variables that are neither the query, evidence nor one of their
+# ancestors cannot change the answer and are never sampled.
+class Sampler:
+    def __init__(self, cpds, state_names):
+        self.cpds = {variables[0]: (list(variables[1:]), np.asarray(values, dtype=np.float64)) for variables, values in cpds}
+        self.state_names = state_names
+        self.order = topological_order(cpds)
+        self.codes = {variable: {state: code for code, state in enumerate(states)} for variable, states in state_names.items()}
+        self.relevant = {}  # (query, evidence variables) -> variables in topological order
+
+    @classmethod
+    def from_network(cls, network):
+        return cls(network.cpds, network.state_names)
+
+    def _relevant(self, query, evidence):
+        key = (query, tuple(sorted(evidence)))
+        if key not in self.relevant:
+            needed = set()
+            stack = [query, *evidence]
+            while stack:
+                variable = stack.pop()
+                if variable not in needed:
+                    needed.add(variable)
+                    stack += self.cpds[variable][0]
+            self.relevant[key] = [variable for variable in self.order if variable in needed]
+        return self.relevant[key]
+
+    def _encode(self, evidence):
+        codes = {}
+        for variable, state in evidence.items():
+            if state is None:
+                continue
+            if variable not in self.cpds:
+                raise ValueError(f"unknown variable {variable!r}")
+            if state not in self.codes[variable]:
+                raise ValueError(f"unknown {variable} state {state!r}")
+            codes[variable] = self.codes[variable][state]
+        return codes
+
+    def _forward(self, variables, evidence, n, rng):
+        """Samples variables in topological order with the evidence clamped.
+        Returns (state codes per variable, likelihood weights)."""
+        drawn = {}
+        weights = np.ones(n)
+        for variable in variables:
+            parents, values = self.cpds[variable]
+            index = tuple(drawn[parent] for parent in parents)
+            if variable in evidence:
+                code = evidence[variable]
+                drawn[variable] = np.full(n, code, dtype=np.intp)
+                weights *= values[(code,) + index]
+            else:
+                probabilities = values[(slice(None),) + index]
+                if not parents:
+                    probabilities = np.broadcast_to(probabilities[:, None], (len(probabilities), n))
+                drawn[variable] = _choose(probabilities, rng.random(n))
+        return drawn, weights
+
+    def sample(self, n, seed=None, evidence=None):
+        """Returns n forward samples as {variable: array of state codes}, with the
+        variables in evidence ({variable: state}) fixed instead of sampled."""
+        rng = np.random.default_rng(seed)
+        drawn, _ = self._forward(self.order, self._encode(evidence or {}), n, rng)
+        return drawn
+
+    def likelihood_weighting(self, query, evidence, samples=100000, seed=None, batch_size=1 << 16):
+        """Returns P(query | evidence) as an array over the query states, estimated
+        from samples weighted by the likelihood of the evidence."""
+        rng = np.random.default_rng(seed)
+        evidence = self._encode(evidence)
+        card = len(self.state_names[query])
+        if query in evidence:
+            return np.eye(card)[evidence[query]]
+
+        variables = self._relevant(query, evidence)
+        totals = np.zeros(card)
+        for start in range(0, samples, batch_size):
+            drawn, weights = self._forward(variables, evidence, min(batch_size, samples - start), rng)
+            totals += np.bincount(drawn[query], weights=weights, minlength=card)
+        if not totals.sum():
+            raise ValueError("no sample is consistent with the evidence")
+        return totals / totals.sum()
+
+    def gibbs(self, query, evidence, samples=100000, chains=1000, burn_in=20, seed=None):
+        """Returns P(query | evidence) as an array over the query states, estimated
+        from chains Gibbs chains run side by side until samples draws are kept.
+
+        Chains start from likelihood-weighted samples resampled by weight, so
+        every chain starts consistent with the evidence. The estimate averages
+        the full conditional of the query at each sweep instead of counting its
+        sampled states (Rao-Blackwellization), which lowers the variance.
+        """
+        rng = np.random.default_rng(seed)
+        evidence = self._encode(evidence)
+        card = len(self.state_names[query])
+        if query in evidence:
+            return np.eye(card)[evidence[query]]
+
+        variables = self._relevant(query, evidence)
+        state, weights = self._forward(variables, evidence, chains, rng)
+        if not weights.sum():
+            raise ValueError("no sample is consistent with the evidence")
+        start = rng.choice(chains, chains, p=weights / weights.sum())
+        state = {variable: codes[start] for variable, codes in state.items()}
+
+        # For each sampled variable, its children's CPDs with its own axis moved
+        # to the front, so indexing by the other variables leaves (states, chains)
+        blanket = {variable: [] for variable in variables if variable not in evidence}
+        for child in variables:
+            parents, values = self.cpds[child]
+            for position, parent in enumerate(parents):
+                if parent in blanket:
+                    others = parents[:position] + parents[position + 1:]
+                    blanket[parent].append((child, np.moveaxis(values, position + 1, 0), others))
+
+        totals = np.zeros(card)
+        sweeps = burn_in + -(-samples // chains)
+        for sweep in range(sweeps):
+            for variable, children in blanket.items():
+                parents, values = self.cpds[variable]
+                probabilities = values[(slice(None),) + tuple(state[parent] for parent in parents)]
+                if not parents:
+                    probabilities = probabilities[:, None]
+                for child, moved, others in children:
+                    probabilities = probabilities * moved[(slice(None), state[child]) + tuple(state[other] for other in others)]
+                probabilities = np.broadcast_to(probabilities, (len(probabilities), chains))
+                state[variable] = _choose(probabilities, rng.random(chains))
+                if variable == query and sweep >= burn_in:
+                    totals += (probabilities / probabilities.sum(axis=0)).sum(axis=1)
+        return totals / totals.sum()
+
+
+# The congestion network grown to a corridor of roads: weather and time of
+# day are shared, every road has its own accident, historical and current
+# congestion variables plus noisy sensors reading its current congestion,
+# and each road's current congestion also depends on the previous road's.
+# The base CPDs come from the congestion model; the rest are seeded random.
+def corridor_network(roads, sensors=2, seed=0, network=None):
+    rng = np.random.default_rng(seed)
+    network = network or load_network()
+    base = {variables[0]: (variables, values) for variables, values in network.cpds}
+    levels = network.state_names["current_congestion_level"]
+
+    cpds = [base["weather"], base["time_of_day"]]
+    state_names = {"weather": network.state_names["weather"], "time_of_day": network.state_names["time_of_day"]}
+    for road in range(roads):
+        accident = f"accident_{road}"
+        historical = f"historical_{road}"
+        current = f"current_{road}"
+        cpds.append(([accident], base["accident"][1]))
+        cpds.append(([historical, "weather", "time_of_day", accident], base["historical_congestion_level"][1]))
+        if road:
+            values = rng.dirichlet(np.full(len(levels), 2.0), size=(len(levels), len(levels)))
+            cpds.append(([current, historical, f"current_{road - 1}"], np.moveaxis(values, -1, 0)))
+        else:
+            cpds.append(([current, historical], base["current_congestion_level"][1]))
+        state_names.update({accident: network.state_names["accident"], historical: levels, current: levels})
+        for sensor in range(sensors):
+            name = f"sensor_{road}_{sensor}"
+            cpds.append(([name, current], 0.7 * np.eye(len(levels)) + 0.1))
+            state_names[name] = levels
+    return cpds, state_names
+
+
+# Builds a pgmpy BayesianNetwork from (variables, values) CPDs, for exact
+# reference answers
+def to_pgmpy(cpds, state_names):
+    from pgmpy.models import BayesianNetwork
+    from pgmpy.factors.discrete import TabularCPD
+
+    model = BayesianNetwork()
+    model.add_nodes_from(variables[0] for variables, _ in cpds)
+    model.add_edges_from((parent, variables[0]) for variables, _ in cpds for parent in variables[1:])
+    for variables, values in cpds:
+        values = np.asarray(values)
+        model.add_cpds(TabularCPD(
+            variable=variables[0],
+            variable_card=values.shape[0],
+            values=values.reshape(values.shape[0], -1),
+            evidence=variables[1:] or None,
+            evidence_card=list(values.shape[1:]) or None,
+            state_names={variable: state_names[variable] for variable in variables},
+        ))
+    assert model.check_model()
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare approximate inference with VariableElimination "
+                                                 "on a corridor of congestion networks.")
+    parser.add_argument("--roads", type=int, default=20)
+    parser.add_argument("--sensors", type=int, default=2)
+    parser.add_argument("--samples", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--chains", type=int, default=1000, help="Gibbs chains run side by side")
+    parser.add_argument("--burn-in", type=int, default=20, help="Gibbs sweeps discarded per chain")
+    parser.add_argument("--runs", type=int, default=5, help="seeded runs per setting")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    from pgmpy.inference import VariableElimination
+
+    cpds, state_names = corridor_network(args.roads, args.sensors, args.seed)
+    sampler = Sampler(cpds, state_names)
+
+    # Observe the weather and every sensor of a seeded forward sample; ask
+    # for the current congestion of the last road
+    observed = sampler.sample(1, args.seed)
+    evidence = {
+        variable: state_names[variable][codes[0]]
+        for variable, codes in observed.items()
+        if variable == "weather" or variable.startswith("sensor_")
+    }
+    query = f"current_{args.roads - 1}"
+    print(f"{len(cpds)} variables, {len(evidence)} observed, query {query}")
+
+    start_time = time.perf_counter()
+    inference = VariableElimination(to_pgmpy(cpds, state_names))
+    factor = inference.query([query], evidence=evidence, show_progress=False)
+    exact = np.array([factor.values[factor.state_names[query].index(state)] for state in state_names[query]])
+    print(f"VariableElimination: {time.perf_counter() - start_time:.3f} s")
+
+    print(f"{'method':<22}{'samples':>10}{'seconds':>10}{'max error':>12}")
+    methods = {
+        "likelihood_weighting": lambda samples, seed: sampler.likelihood_weighting(query, evidence, samples, seed),
+        "gibbs": lambda samples, seed: sampler.gibbs(query, evidence, samples, args.chains, args.burn_in, seed),
+    }
+    for name, method in methods.items():
+        for samples in args.samples:
+            seconds = errors = 0.0
+            for run in range(args.runs):
+                start_time = time.perf_counter()
+                estimate = method(samples, args.seed + run)
+                seconds += time.perf_counter() - start_time
+                errors += np.abs(estimate - exact).max()
+            print(f"{name:<22}{samples:>10}{seconds / args.runs:>10.4f}{errors / args.runs:>12.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+import heapq
+import pickle
+from array import array
+
+from logic import And, Biconditional, Implication, Not, Or, Sentence, Symbol, components, conjuncts
+
+FORMAT_VERSION = 1
+
+FALSE = 0
+TRUE = 1
+
+# Binary operations as truth tables indexed by 2 * u + v for terminal u, v
+AND = (0, 0, 0, 1)
+OR = (0, 1, 1, 1)
+XOR = (0, 1, 1, 0)
+IMPLIES = (1, 1, 0, 1)
+IFF = (1, 0, 0, 1)
+
+
+def variable_order(sentence):
+    """Orders the symbols of sentence so that related symbols get neighbouring levels.
+
+    Symbols of independent components are kept together; within a component,
+    maximum cardinality search over the "appear in the same conjunct" graph
+    places next the symbol sharing the most conjuncts with those already
+    placed, starting from the most connected one.
+    """
+    order = []
+    for names, sentences in components(conjuncts(sentence)):
+        if not names:
+            # Conjuncts without symbols, such as an empty Or()
+            continue
+        neighbours = {name: {} for name in names}
+        for part in sentences:
+            symbols = sorted(part.symbol_set())
+            for a in symbols:
+                for b in symbols:
+                    if a != b:
+                        neighbours[a][b] = neighbours[a].get(b, 0) + 1
+
+        weight = {name: 0 for name in names}
+        start = max(sorted(names), key=lambda name: sum(neighbours[name].values()))
+        heap = [(0, start)]
+        placed = set()
+        while heap:
+            _, name = heapq.heappop(heap)
+            if name in placed:
+                continue
+            placed.add(name)
+            order.append(name)
+            for other, count in neighbours[name].items():
+                if other not in placed:
+                    weight[other] += count
+                    heapq.heappush(heap, (-weight[other], other))
+            if not heap:
+                # Symbols not connected to the start (no shared conjunct)
+                remaining = sorted(set(names) - placed)
+                if remaining:
+                    heapq.heappush(heap, (0, remaining[0]))
+    return order
+
+
+class BDD():
+    """A manager for reduced ordered binary decision diagrams.
+
+    Nodes are integers: 0 and 1 are the terminals, every other node is a
+    (level, low, high) triple kept unique through the unique table, so two
+    equivalent functions over the same order are the same node. Results of
+    apply() are cached in the computed table. All traversals are iterative,
+    so diagrams may be deeper than Python's recursion limit.
+    """
+
+    def __init__(self, order=()):
+        self.order = []
+        self.levels = {}  # Symbol name -> level
+        # Terminals sit below every variable
+        self.level = array("q", [1 << 62, 1 << 62])
+        self.low = array("q", [FALSE, TRUE])
+        self.high = array("q", [FALSE, TRUE])
+        self.unique = {}  # (level, low, high) -> node
+        self.computed = {}  # (operation, u, v) -> node
+        self.compiled = {}  # Sentence -> node
+        for name in order:
+            self.add_variable(name)
+
+    def __len__(self):
+        return len(self.level)
+
+    def add_variable(self, name):
+        """Adds a variable below all existing ones and returns its level."""
+        if name not in self.levels:
+            self.levels[name] = len(self.order)
+            self.order.append(name)
+        return self.levels[name]
+
+    def node(self, level, low, high):
+        """Returns the reduced node testing level with the given children."""
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            node = self.unique[key] = len(self.level)
+            self.level.append(level)
+            self.low.append(low)
+            self.high.append(high)
+        return node
+
+    def variable(self, name):
+        return self.node(self.add_variable(name), FALSE, TRUE)
+
+    def _shortcut(self, operation, u, v):
+        """Result of operation without expanding u and v, or None."""
+        if u <= TRUE and v <= TRUE:
+            return operation[2 * u + v]
+        if u == v and operation[0] == 0 and operation[3] == 1:
+            return u
+        if u <= TRUE:
+            low, high = operation[2 * u], operation[2 * u + 1]
+            if low == high:
+                return low
+            if (low, high) == (0, 1):
+                return v
+        if v <= TRUE:
+            low, high = operation[v], operation[2 + v]
+            if low == high:
+                return low
+            if (low, high) == (0, 1):
+                return u
+        return None
+
+    def apply(self, operation, u, v):
+        """Combines two diagrams with a binary operation (AND, OR, XOR, IMPLIES, IFF)."""
+        computed = self.computed
+        level, low, high = self.level, self.low, self.high
+        result = self._shortcut(operation, u, v)
+        if result is not None:
+            return result
+        key = (operation, u, v)
+        stack = [(u, v)]
+        while stack:
+            u, v = stack[-1]
+            if (operation, u, v) in computed:
+                stack.pop()
+                continue
+            top = min(level[u], level[v])
+            u0, u1 = (low[u], high[u]) if level[u] == top else (u, u)
+            v0, v1 = (low[v], high[v]) if level[v] == top else (v, v)
+
+            r0 = self._shortcut(operation, u0, v0)
+            if r0 is None:
+                r0 = computed.get((operation, u0, v0))
+                if r0 is None:
+                    stack.append((u0, v0))
+                    continue
+            r1 = self._shortcut(operation, u1, v1)
+            if r1 is None:
+                r1 = computed.get((operation, u1, v1))
+                if r1 is None:
+                    stack.append((u1, v1))
+                    continue
+            computed[(operation, u, v)] = self.node(top, r0, r1)
+            stack.pop()
+        return computed[key]
+
+    def negate(self, u):
+        return self.apply(XOR, u, TRUE)
+
+    def _combine(self, operation, nodes, empty):
+        # Pairwise rather than left-to-right keeps intermediate diagrams small
+        nodes = list(nodes)
+        if not nodes:
+            return empty
+        while len(nodes) > 1:
+            paired = [self.apply(operation, nodes[i], nodes[i + 1]) for i in range(0, len(nodes) - 1, 2)]
+            if len(nodes) % 2:
+                paired.append(nodes[-1])
+            nodes = paired
+        return nodes[0]
+
+    def compile(self, sentence):
+        """Returns the node for a Sentence; symbols not yet ordered are added at the bottom."""
+        Sentence.validate(sentence)
+        stack = [sentence]
+        while stack:
+            current = stack[-1]
+            if current in self.compiled:
+                stack.pop()
+                continue
+            if isinstance(current, Symbol):
+                self.compiled[current] = self.variable(current.name)
+                stack.pop()
+                continue
+            pending = [child for child in current.children() if child not in self.compiled]
+            if pending:
+                stack.extend(pending)
+                continue
+
+            children = [self.compiled[child] for child in current.children()]
+            if isinstance(current, Not):
+                node = self.negate(children[0])
+            elif isinstance(current, And):
+                node = self._combine(AND, children, TRUE)
+            elif isinstance(current, Or):
+                node = self._combine(OR, children, FALSE)
+            elif isinstance(current, Implication):
+                node = self.apply(IMPLIES, *children)
+            elif isinstance(current, Biconditional):
+                node = self.apply(IFF, *children)
+            else:
+                raise TypeError("must be a logical sentence")
+            self.compiled[current] = node
+            stack.pop()
+        return self.compiled[sentence]
+
+    def restrict(self, u, assignment):
+        """Conditions u on a {symbol name: bool} assignment."""
+        fixed = {self.levels[name]: bool(value) for name, value in assignment.items() if name in self.levels}
+        level, low, high = self.level, self.low, self.high
+        result = {FALSE: FALSE, TRUE: TRUE}
+        stack = [u]
+        while stack:
+            current = stack[-1]
+            if current in result:
+                stack.pop()
+                continue
+            if level[current] in fixed:
+                child = high[current] if fixed[level[current]] else low[current]
+                if child not in result:
+                    stack.append(child)
+                    continue
+                result[current] = result[child]
+            else:
+                if low[current] not in result:
+                    stack.append(low[current])
+                    continue
+                if high[current] not in result:
+                    stack.append(high[current])
+                    continue
+                result[current] = self.node(level[current], result[low[current]], result[high[current]])
+            stack.pop()
+        return result[u]
+
+    def count(self, u, symbols=None):
+        """Counts the models of u over all variables, or over symbols if given
+        (which must include every symbol u depends on). Symbols outside the
+        order are free and double the count each."""
+        n = len(self.order)
+        level, low, high = self.level, self.low, self.high
+
+        def depth(node):
+            return n if node <= TRUE else level[node]
+
+        counts = {FALSE: 0, TRUE: 1}  # Models over the variables from depth(node) down
+        stack = [u]
+        while stack:
+            current = stack[-1]
+            if current in counts:
+                stack.pop()
+                continue
+            if low[current] not in counts:
+                stack.append(low[current])
+                continue
+            if high[current] not in counts:
+                stack.append(high[current])
+                continue
+            below = level[current] + 1
+            counts[current] = (counts[low[current]] << (depth(low[current]) - below)) + \
+                (counts[high[current]] << (depth(high[current]) - below))
+            stack.pop()
+
+        total = counts[u] << depth(u)
+        if symbols is None:
+            return total
+        symbols = set(symbols)
+        known = len(symbols.intersection(self.levels))
+        return (total >> (n - known)) << (len(symbols) - known)
+
+    def evaluate(self, u, model):
+        """Evaluates u in a {symbol name: bool} model."""
+        while u > TRUE:
+            name = self.order[self.level[u]]
+            u = self.high[u] if model[name] else self.low[u]
+        return u == TRUE
+
+    def implied_literals(self, u):
+        """Returns {symbol name: value} for every variable fixed in all models of u.
+
+        One pass over the diagram: a variable is fixed when no path to TRUE
+        skips its level and every node at its level sends one branch to FALSE.
+        """
+        n = len(self.order)
+        if u == FALSE:
+            return {}
+        level, low, high = self.level, self.low, self.high
+
+        def depth(node):
+            return n if node <= TRUE else level[node]
+
+        skipped = [0] * (n + 1)  # Difference array over levels jumped by some edge
+        skipped[0] += 1
+        skipped[depth(u)] -= 1
+        forced = {}  # Level -> value, or None once both values are possible
+        for node in self._reachable([u]):
+            if node <= TRUE:
+                continue
+            for child in (low[node], high[node]):
+                if child != FALSE:
+                    skipped[level[node] + 1] += 1
+                    skipped[depth(child)] -= 1
+            value = None if low[node] != FALSE and high[node] != FALSE else high[node] != FALSE
+            forced[level[node]] = value if forced.get(level[node], value) == value else None
+
+        implied = {}
+        running = 0
+        for variable in range(n):
+            running += skipped[variable]
+            if not running and forced.get(variable) is not None:
+                implied[self.order[variable]] = forced[variable]
+        return implied
+
+    def entails(self, u, v):
+        """Checks if every model of u is a model of v."""
+        return self.apply(IMPLIES, u, v) == TRUE
+
+    def clear_cache(self):
+        """Drops the computed table (nodes stay valid)."""
+        self.computed.clear()
+
+    def save(self, path, roots, variables=None):
+        """Writes the nodes reachable from roots ({name: node}) to disk, with
+        the first variables symbols of the order (all by default)."""
+        reachable = sorted(self._reachable(roots.values()))
+        renumber = {node: i for i, node in enumerate(reachable)}
+        with open(path, "wb") as file:
+            pickle.dump({
+                "version": FORMAT_VERSION,
+                "order": self.order[:variables],
+                "nodes": [
+                    (self.level[node], renumber[self.low[node]], renumber[self.high[node]])
+                    for node in reachable[2:]
+                ],
+                "roots": {name: renumber[node] for name, node in roots.items()},
+            }, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a file written by save(); returns (bdd, roots)."""
+        with open(path, "rb") as file:
+            data = pickle.load(file)
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported BDD format in {path}")
+        bdd = cls(data["order"])
+        nodes = [FALSE, TRUE]
+        # Children always precede their parents in the saved order
+        for level, low, high in data["nodes"]:
+            nodes.append(bdd.node(level, nodes[low], nodes[high]))
+        return bdd, {name: nodes[node] for name, node in data["roots"].items()}
+
+    def _reachable(self, roots):
+        seen = {FALSE, TRUE}
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            if node not in seen:
+                seen.add(node)
+                stack.append(self.low[node])
+                stack.append(self.high[node])
+        return seen
+
+
+# A knowledge base compiled once into a BDD; queries, conditioning and model
+# counting then work on the diagram instead of enumerating models
+class CompiledKnowledge():
+    def __init__(self, knowledge, order=None, bdd=None, root=None, variables=None):
+        if bdd is None:
+            bdd = BDD(variable_order(knowledge) if order is None else order)
+            root = bdd.compile(knowledge)
+        self.bdd = bdd
+        self.root = root
+        # Queries add their new symbols to the end of the shared order; the
+        # knowledge base's own symbols are the ones before them
+        self.variables = len(bdd.order) if variables is None else variables
+        self._implied = None
+
+    def __len__(self):
+        """Number of nodes in the compiled knowledge base."""
+        return len(self.bdd._reachable([self.root]))
+
+    def implied(self):
+        """{symbol name: value} for every literal the knowledge base entails, computed once."""
+        if self._implied is None:
+            self._implied = self.bdd.implied_literals(self.root)
+        return self._implied
+
+    def entails(self, query):
+        if self.root == FALSE:
+            return True
+        # Literal queries are lookups in the implied literals
+        if isinstance(query, Symbol):
+            return self.implied().get(query.name) is True
+        if isinstance(query, Not) and isinstance(query.operand, Symbol):
+            return self.implied().get(query.operand.name) is False
+        return self.bdd.entails(self.root, self.bdd.compile(query))
+
+    def ask_all(self, queries):
+        return [self.entails(query) for query in queries]
+
+    def satisfiable(self):
+        return self.root != FALSE
+
+    def condition(self, facts):
+        """Returns the knowledge base with {symbol name: bool} facts fixed."""
+        return CompiledKnowledge(None, bdd=self.bdd, root=self.bdd.restrict(self.root, facts),
+                                 variables=self.variables)
+
+    def symbols(self):
+        """Names of the knowledge base's symbols, in variable order."""
+        return self.bdd.order[:self.variables]
+
+    def count(self, symbols=None):
+        """Counts models over the knowledge base's symbols, or over symbols."""
+        return self.bdd.count(self.root, self.symbols() if symbols is None else symbols)
+
+    def save(self, path):
+        self.bdd.save(path, {"knowledge": self.root}, self.variables)
+
+    @classmethod
+    def load(cls, path):
+        bdd, roots = BDD.load(path)
+        return cls(None, bdd=bdd, root=roots["knowledge"])
@@ -1,19 +1,51 @@
+import argparse
 import json
+import os
+import sys
+import tempfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 from logic import *
 
-# Load traffic data
-with open("traffic_data.json", "r") as file:
-    traffic_data = json.load(file)
 
-# Get unique drivers
-drivers = set(entry["Driver"] for entry in traffic_data)
+# Violation types, in the order of the flag tuples below
+VIOLATIONS = ("Speeding", "Jumped Red Light", "Multiple Locations")
+
+# Speed_Limit value of roads without a limit
+NO_LIMIT = "No Limit"
+
+
+# Violation flags taken from the recorded "Violation" label
+def label_flags(entry):
+    return tuple(violation in entry["Violation"] for violation in VIOLATIONS)
+
+
+# Violation flags derived from the raw telemetry fields
+def telemetry_flags(entry):
+    speed_limit = entry["Speed_Limit"]
+    return (
+        speed_limit != NO_LIMIT and entry["Speed"] > speed_limit,
+        entry["Signal"] == "Red",
+        len(entry["Locations"]) > 1,
+    )
+
+
+FLAG_SOURCES = {"label": label_flags, "telemetry": telemetry_flags}
+
+
+# Report text for a telemetry-derived result; an entailed violation without
+# flags of its own comes from inconsistent records for the same driver and day
+def telemetry_violation(flags, violated):
+    if not violated:
+        return "No Violation"
+    return " & ".join(violation for violation, flag in zip(VIOLATIONS, flags) if flag) or "Violation"
 
-# Process each driver separately
-for driver in drivers:
-    print(f"\nTraffic Violation Check for {driver}:")
 
-    # Filter data for the current driver
-    driver_data = [entry for entry in traffic_data if entry["Driver"] == driver]
+# Builds the rules, the facts and the per-day violation symbols for one driver
+def driver_knowledge(driver, driver_data, source="label"):
+    flags = FLAG_SOURCES[source]
 
     # Define logical symbols for each day's violations
     speed_symbols = {}
@@ -41,24 +73,182 @@ for driver in drivers:
     ])
 
     # Assign known values from data
-    facts = And(*[
-        speed_symbols[entry["Day"]] if "Speeding" in entry["Violation"] else Not(speed_symbols[entry["Day"]])
-        for entry in driver_data
-    ] + [
-        red_light_symbols[entry["Day"]] if "Jumped Red Light" in entry["Violation"] else Not(red_light_symbols[entry["Day"]])
-        for entry in driver_data
-    ] + [
-        location_symbols[entry["Day"]] if "Multiple Locations" in entry["Violation"] else Not(location_symbols[entry["Day"]])
-        for entry in driver_data
-    ])
-
-    # Check for violations using model_check()
+    facts = []
     for entry in driver_data:
         day = entry["Day"]
-        violation_result = model_check(And(rules, facts), violation_symbols[day])
+        for symbol, flag in zip((speed_symbols[day], red_light_symbols[day], location_symbols[day]), flags(entry)):
+            facts.append(symbol if flag else Not(symbol))
+    facts = And(*facts)
+
+    return rules, facts, violation_symbols
+
+
+# Returns (day, violation) for each of one driver's entries; violation is
+# "No Violation" when the knowledge base does not entail one. With
+# source="telemetry" the facts and the reported text come from the raw fields.
+def check_driver(driver, driver_data, source="label"):
+    rules, facts, violation_symbols = driver_knowledge(driver, driver_data, source)
+
+    # Different days share no symbols, so the knowledge base splits into one
+    # small component per day and each day is answered from its own
+    knowledge = DecomposedKnowledge(And(rules, facts))
+    results = knowledge.ask_all([violation_symbols[entry["Day"]] for entry in driver_data])
+
+    if source == "telemetry":
+        return [
+            (entry["Day"], telemetry_violation(telemetry_flags(entry), result))
+            for entry, result in zip(driver_data, results)
+        ]
+    return [
+        (entry["Day"], entry["Violation"] if result else "No Violation")
+        for entry, result in zip(driver_data, results)
+    ]
+
+
+# Yields the records of a JSON array or of a JSON Lines file one at a time,
+# reading buffer_size characters at a time
+def read_records(file, buffer_size=1 << 16):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    in_array = None
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = file.read(buffer_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    while True:
+        # Skip whitespace (and commas between array items)
+        while True:
+            while position < len(buffer) and (buffer[position].isspace() or (in_array and buffer[position] == ",")):
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            fill()
+        if position == len(buffer):
+            if in_array:
+                raise ValueError("unterminated JSON array")
+            return
+
+        if in_array is None:
+            in_array = buffer[position] == "["
+            if in_array:
+                position += 1
+                continue
+        elif in_array and buffer[position] == "]":
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if not eof and (end == len(buffer) or buffer[end] not in " \t\r\n,]"):
+            # A number may continue in the next chunk ("8.5" of "8.5e3")
+            fill()
+            continue
+        yield record
+        position = end
+        if position > buffer_size:
+            buffer = buffer[position:]
+            position = 0
+
+
+# Single pass group-by-driver. Up to max_records records are grouped in
+# memory; past that, records are spread over partition files by driver and
+# each partition is grouped on its own, so memory stays bounded by the
+# largest partition instead of the whole feed.
+def group_by_driver(records, max_records=100000, partitions=64):
+    groups = {}
+    buffered = 0
+    records = iter(records)
+    for entry in records:
+        groups.setdefault(entry["Driver"], []).append(entry)
+        buffered += 1
+        if buffered > max_records:
+            break
+    else:
+        yield from groups.items()
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, f"part{i}.jsonl") for i in range(partitions)]
+        files = [open(path, "w") for path in paths]
+        try:
+            def spill(entry):
+                partition = zlib.crc32(str(entry["Driver"]).encode("utf-8")) % partitions
+                files[partition].write(json.dumps(entry) + "\n")
+
+            for driver_data in groups.values():
+                for entry in driver_data:
+                    spill(entry)
+            groups = None
+            for entry in records:
+                spill(entry)
+        finally:
+            for file in files:
+                file.close()
+
+        for path in paths:
+            groups = {}
+            with open(path) as file:
+                for entry in read_records(file):
+                    groups.setdefault(entry["Driver"], []).append(entry)
+            yield from groups.items()
+
+
+# Yields (driver, check_driver() results) for each (driver, entries) group.
+# With processes > 1 drivers are checked in parallel, in the same order,
+# with at most window groups in flight at a time.
+def check_drivers(groups, processes=None, window=None, source="label"):
+    if not processes or processes <= 1:
+        yield from ((driver, check_driver(driver, driver_data, source)) for driver, driver_data in groups)
+        return
+
+    window = window or 4 * processes
+    with ProcessPoolExecutor(processes) as executor:
+        pending = deque()
+        for driver, driver_data in groups:
+            pending.append((driver, executor.submit(check_driver, driver, driver_data, source)))
+            if len(pending) >= window:
+                driver, future = pending.popleft()
+                yield driver, future.result()
+        while pending:
+            driver, future = pending.popleft()
+            yield driver, future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check traffic violations for every driver.")
+    parser.add_argument("--data", default="traffic_data.json", help="JSON array or JSON Lines file, - for stdin")
+    parser.add_argument("--output", default="-", help="JSON Lines report, - for stdout")
+    parser.add_argument("--processes", type=int, default=None, help="check drivers in parallel")
+    parser.add_argument("--source", default="label", choices=list(FLAG_SOURCES),
+                        help="take violations from the Violation label or from the raw telemetry fields")
+    parser.add_argument("--max-records", type=int, default=100000,
+                        help="records grouped in memory before spilling to partition files")
+    args = parser.parse_args(argv)
+
+    data = sys.stdin if args.data == "-" else open(args.data, "r")
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        groups = group_by_driver(read_records(data), args.max_records)
+        for driver, results in check_drivers(groups, args.processes, source=args.source):
+            for day, violation in results:
+                output.write(json.dumps({"Driver": driver, "Day": day, "Violation": violation}) + "\n")
+    finally:
+        if data is not sys.stdin:
+            data.close()
+        if output is not sys.stdout:
+            output.close()
+
 
-        # Print the violation type if there is a violation
-        if violation_result:
-            print(f"Day {day} Violation: {entry['Violation']}")
-        else:
-            print(f"Day {day} Violation: No Violation")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from check_violations import NO_LIMIT, VIOLATIONS, read_records, telemetry_violation
+
+# One row per traffic record; drivers are stored as indices into a name list
+# and roads without a limit get an infinite speed limit
+RECORD_DTYPE = np.dtype([
+    ("driver", np.int32),
+    ("day", np.int64),
+    ("speed", np.float64),
+    ("speed_limit", np.float64),
+    ("red_signal", np.bool_),
+    ("locations", np.int32),
+])
+
+
+# Traffic records held as a NumPy structured array
+class TrafficColumns:
+    def __init__(self, drivers, records):
+        self.drivers = drivers
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    @classmethod
+    def from_records(cls, records, chunk_size=65536):
+        """Builds the columns from an iterable of record dicts, converting chunk_size rows at a time."""
+        drivers = []
+        codes = {}
+        chunks = []
+        rows = []
+        for entry in records:
+            driver = entry["Driver"]
+            code = codes.get(driver)
+            if code is None:
+                code = codes[driver] = len(drivers)
+                drivers.append(driver)
+            speed_limit = entry["Speed_Limit"]
+            rows.append((
+                code,
+                entry["Day"],
+                entry["Speed"],
+                np.inf if speed_limit == NO_LIMIT else speed_limit,
+                entry["Signal"] == "Red",
+                len(entry["Locations"]),
+            ))
+            if len(rows) == chunk_size:
+                chunks.append(np.array(rows, dtype=RECORD_DTYPE))
+                rows = []
+        chunks.append(np.array(rows, dtype=RECORD_DTYPE))
+        return cls(drivers, np.concatenate(chunks))
+
+    def flags(self):
+        """Returns a (rows, 3) bool array of the speeding, red-light and multi-location flags."""
+        records = self.records
+        return np.column_stack([
+            records["speed"] > records["speed_limit"],
+            records["red_signal"],
+            records["locations"] > 1,
+        ])
+
+    def violations(self, flags=None):
+        """Returns a bool array: does each record's driver-day carry a violation.
+
+        Matches the logic engine: a record is a violation when one of its
+        flags is set, and every record of a driver is one when two of that
+        driver's records for the same day disagree, since that driver's
+        knowledge base is then inconsistent and entails everything.
+        """
+        if flags is None:
+            flags = self.flags()
+        records = self.records
+        violated = flags.any(axis=1)
+        if not len(records):
+            return violated
+
+        codes = flags @ np.array([1, 2, 4], dtype=np.int8)
+        order = np.lexsort((records["day"], records["driver"]))
+        driver = records["driver"][order]
+        day = records["day"][order]
+        starts = np.flatnonzero(np.concatenate(([True], (driver[1:] != driver[:-1]) | (day[1:] != day[:-1]))))
+        sorted_codes = codes[order]
+        conflicting = np.minimum.reduceat(sorted_codes, starts) != np.maximum.reduceat(sorted_codes, starts)
+        if conflicting.any():
+            violated |= np.isin(records["driver"], driver[starts[conflicting]])
+        return violated
+
+
+def write_report(columns, output, flags=None, violated=None):
+    """Writes one {Driver, Day, Violation} JSON line per record, in record order."""
+    if flags is None:
+        flags = columns.flags()
+    if violated is None:
+        violated = columns.violations(flags)
+
+    # The report text only depends on the three flags and the verdict
+    codes = flags @ np.array([1, 2, 4], dtype=np.int8) + 8 * violated
+    texts = [
+        telemetry_violation([code >> i & 1 for i in range(len(VIOLATIONS))], code >= 8)
+        for code in range(16)
+    ]
+    records = columns.records
+    for driver, day, code in zip(records["driver"].tolist(), records["day"].tolist(), codes.tolist()):
+        output.write(json.dumps({"Driver": columns.drivers[driver], "Day": day, "Violation": texts[code]}) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect violations from raw telemetry with vectorized predicates.")
+    parser.add_argument("--data", default="traffic_data.json", help="JSON array or JSON Lines file, - for stdin")
+    parser.add_argument("--output", default="-", help="JSON Lines report, - for stdout")
+    args = parser.parse_args(argv)
+
+    data = sys.stdin if args.data == "-" else open(args.data, "r")
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        columns = TrafficColumns.from_records(read_records(data))
+        write_report(columns, output)
+    finally:
+        if data is not sys.stdin:
+            data.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
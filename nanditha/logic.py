@@ -1,7 +1,47 @@
+import functools
+import heapq
 import itertools
+import weakref
+
+
+class EvaluationException(Exception):
+    pass
 
 
 class Sentence():
+    """Base class of logical sentences.
+
+    Sentences are hash-consed: constructing a sentence structurally equal to
+    a live one returns the existing instance, so equal subformulas are shared
+    and compare by identity. Each node caches its hash, symbol set and
+    formula string.
+    """
+
+    __slots__ = ("_hash", "_symbols", "_formula", "__weakref__")
+
+    # (kind, children...) -> weak reference to the node; entries are dropped
+    # with the node's last reference
+    _interned = {}
+
+    @classmethod
+    def _node(cls, key, **fields):
+        """Returns the interned node for key, creating it with fields if needed."""
+        ref = Sentence._interned.get(key)
+        node = ref() if ref is not None else None
+        if node is None:
+            node = object.__new__(cls)
+            for name, value in fields.items():
+                setattr(node, name, value)
+            node._hash = hash(key)
+            node._symbols = None
+            node._formula = None
+            Sentence._interned[key] = weakref.ref(node, functools.partial(Sentence._release, key))
+        return node
+
+    @staticmethod
+    def _release(key, ref):
+        if Sentence._interned.get(key) is ref:
+            del Sentence._interned[key]
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
@@ -13,7 +53,20 @@ class Sentence():
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self.symbol_set())
+
+    def symbol_set(self):
+        """Returns the cached frozenset of symbol names in the sentence."""
+        if self._symbols is None:
+            symbols = set()
+            for child in self.children():
+                symbols |= child.symbol_set()
+            self._symbols = frozenset(symbols)
+        return self._symbols
+
+    def children(self):
+        """Returns the direct subsentences."""
+        return ()
 
     @classmethod
     def validate(cls, sentence):
@@ -43,15 +96,19 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
+
+    def __new__(cls, name):
+        return cls._node(("symbol", name), name=name)
 
-    def __init__(self, name):
-        self.name = name
+    def __reduce__(self):
+        return Symbol, (self.name,)
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (isinstance(other, Symbol) and self.name == other.name)
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        return self._hash
 
     def __repr__(self):
         return self.name
@@ -65,20 +122,27 @@ class Symbol(Sentence):
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def symbol_set(self):
+        if self._symbols is None:
+            self._symbols = frozenset((self.name,))
+        return self._symbols
 
 
 class Not(Sentence):
-    def __init__(self, operand):
+    __slots__ = ("operand",)
+
+    def __new__(cls, operand):
         Sentence.validate(operand)
-        self.operand = operand
+        return cls._node(("not", operand), operand=operand)
+
+    def __reduce__(self):
+        return Not, (self.operand,)
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (isinstance(other, Not) and self.operand == other.operand)
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        return self._hash
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -87,25 +151,30 @@ class Not(Sentence):
         return not self.operand.evaluate(model)
 
     def formula(self):
-        return "¬" + Sentence.parenthesize(self.operand.formula())
+        if self._formula is None:
+            self._formula = "¬" + Sentence.parenthesize(self.operand.formula())
+        return self._formula
 
-    def symbols(self):
-        return self.operand.symbols()
+    def children(self):
+        return (self.operand,)
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
+    __slots__ = ("conjuncts",)
+
+    def __new__(cls, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
+        return cls._node(("and",) + conjuncts, conjuncts=list(conjuncts))
+
+    def __reduce__(self):
+        return And, tuple(self.conjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (isinstance(other, And) and self.conjuncts == other.conjuncts)
 
     def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        return self._hash
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,35 +183,55 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
+        """Adds a conjunct in place.
+
+        The node stops being shared with future And(...) calls, but every
+        existing reference to it sees the change, and sentences already
+        built on top of it keep their cached hashes and symbol sets; build
+        conjunctions with one And(...) call where possible.
+        """
         Sentence.validate(conjunct)
+        key = ("and",) + tuple(self.conjuncts)
+        ref = Sentence._interned.get(key)
+        if ref is not None and ref() is self:
+            del Sentence._interned[key]
         self.conjuncts.append(conjunct)
+        self._hash = hash(key + (conjunct,))
+        self._symbols = None
+        self._formula = None
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
     def formula(self):
-        if len(self.conjuncts) == 1:
-            return self.conjuncts[0].formula()
-        return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
-                           for conjunct in self.conjuncts])
+        if self._formula is None:
+            if len(self.conjuncts) == 1:
+                self._formula = self.conjuncts[0].formula()
+            else:
+                self._formula = " ∧ ".join([Sentence.parenthesize(conjunct.formula())
+                                            for conjunct in self.conjuncts])
+        return self._formula
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def children(self):
+        return self.conjuncts
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+        return cls._node(("or",) + disjuncts, disjuncts=list(disjuncts))
+
+    def __reduce__(self):
+        return Or, tuple(self.disjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (isinstance(other, Or) and self.disjuncts == other.disjuncts)
 
     def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        return self._hash
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -152,29 +241,37 @@ class Or(Sentence):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
     def formula(self):
-        if len(self.disjuncts) == 1:
-            return self.disjuncts[0].formula()
-        return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
-                            for disjunct in self.disjuncts])
+        if self._formula is None:
+            if len(self.disjuncts) == 1:
+                self._formula = self.disjuncts[0].formula()
+            else:
+                self._formula = " ∨  ".join([Sentence.parenthesize(disjunct.formula())
+                                             for disjunct in self.disjuncts])
+        return self._formula
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def children(self):
+        return self.disjuncts
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+        return cls._node(("implies", antecedent, consequent),
+                         antecedent=antecedent, consequent=consequent)
+
+    def __reduce__(self):
+        return Implication, (self.antecedent, self.consequent)
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (isinstance(other, Implication)
+                                 and self.antecedent == other.antecedent
+                                 and self.consequent == other.consequent)
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return self._hash
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -184,45 +281,50 @@ class Implication(Sentence):
                 or self.consequent.evaluate(model))
 
     def formula(self):
-        antecedent = Sentence.parenthesize(self.antecedent.formula())
-        consequent = Sentence.parenthesize(self.consequent.formula())
-        return f"{antecedent} => {consequent}"
+        if self._formula is None:
+            antecedent = Sentence.parenthesize(self.antecedent.formula())
+            consequent = Sentence.parenthesize(self.consequent.formula())
+            self._formula = f"{antecedent} => {consequent}"
+        return self._formula
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def children(self):
+        return (self.antecedent, self.consequent)
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+        return cls._node(("biconditional", left, right), left=left, right=right)
+
+    def __reduce__(self):
+        return Biconditional, (self.left, self.right)
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (isinstance(other, Biconditional)
+                                 and self.left == other.left
+                                 and self.right == other.right)
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return self._hash
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
 
     def evaluate(self, model):
-        return ((self.left.evaluate(model)
-                 and self.right.evaluate(model))
-                or (not self.left.evaluate(model)
-                    and not self.right.evaluate(model)))
+        return self.left.evaluate(model) == self.right.evaluate(model)
 
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
-        return f"{left} <=> {right}"
+        if self._formula is None:
+            left = Sentence.parenthesize(str(self.left))
+            right = Sentence.parenthesize(str(self.right))
+            self._formula = f"{left} <=> {right}"
+        return self._formula
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def children(self):
+        return (self.left, self.right)
 
 
 def model_check(knowledge, query):
@@ -261,3 +363,755 @@ def model_check(knowledge, query):
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+class SATSolver():
+    """CDCL SAT solver over integer literals (v / -v for variable v >= 1).
+
+    Uses two watched literals per clause, first-UIP clause learning with
+    non-chronological backjumping, VSIDS-style variable activities, phase
+    saving and restarts. Learned clauses are kept between calls to solve(),
+    so the same solver can answer many queries under different assumptions.
+    """
+
+    def __init__(self):
+        self.num_vars = 0
+        self.clauses = []
+        self.watches = {}
+        self.value = [0]  # Per variable: 1 true, -1 false, 0 unassigned
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [-1]
+        self.trail = []
+        self.trail_lim = []
+        self.queue_head = 0
+        self.order = []
+        self.increment = 1.0
+        self.inconsistent = False
+
+    def new_var(self):
+        """Adds a fresh variable and returns it."""
+        self.num_vars += 1
+        self.value.append(0)
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.phase.append(-1)
+        self.watches[self.num_vars] = []
+        self.watches[-self.num_vars] = []
+        heapq.heappush(self.order, (0.0, self.num_vars))
+        return self.num_vars
+
+    def lit_value(self, lit):
+        value = self.value[abs(lit)]
+        return value if lit > 0 else -value
+
+    def add_clause(self, literals):
+        """Adds a clause; returns False once the clauses are unsatisfiable at level 0."""
+        self._backtrack(0)
+        clause = []
+        for lit in set(literals):
+            if -lit in literals:
+                return True  # Tautology
+            value = self.lit_value(lit)
+            if value == 1:
+                return True  # Already satisfied
+            if value == 0:
+                clause.append(lit)
+        if not clause:
+            self.inconsistent = True
+        elif len(clause) == 1:
+            self._assign(clause[0], None)
+            if self._propagate() is not None:
+                self.inconsistent = True
+        else:
+            self._attach(clause)
+        return not self.inconsistent
+
+    def _attach(self, clause):
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    def _assign(self, lit, reason):
+        var = abs(lit)
+        self.value[var] = 1 if lit > 0 else -1
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def _propagate(self):
+        """Unit propagation; returns the index of a conflicting clause or None."""
+        # Literal values are inlined here: this loop is where the solver spends its time
+        value, clauses, watches = self.value, self.clauses, self.watches
+        while self.queue_head < len(self.trail):
+            false_lit = -self.trail[self.queue_head]
+            self.queue_head += 1
+            watching = watches[false_lit]
+            kept = []
+            conflict = None
+            for position, index in enumerate(watching):
+                clause = clauses[index]
+                first = clause[0]
+                if first == false_lit:
+                    first = clause[0] = clause[1]
+                    clause[1] = false_lit
+                if (value[first] if first > 0 else -value[-first]) == 1:
+                    kept.append(index)
+                    continue
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    if (value[lit] if lit > 0 else -value[-lit]) != -1:
+                        clause[1], clause[k] = lit, false_lit
+                        watches[lit].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if (value[first] if first > 0 else -value[-first]) == -1:
+                        conflict = index
+                        kept.extend(watching[position + 1:])
+                        break
+                    self._assign(first, index)
+            watches[false_lit] = kept
+            if conflict is not None:
+                return conflict
+        return None
+
+    def _bump(self, var):
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.order = [(-self.activity[v], v) for v in range(1, self.num_vars + 1)]
+            heapq.heapify(self.order)
+        else:
+            heapq.heappush(self.order, (-self.activity[var], var))
+
+    def _analyze(self, conflict):
+        """First-UIP conflict analysis; returns (learned clause, backjump level)."""
+        current_level = len(self.trail_lim)
+        seen = set()
+        learned = [None]
+        pending = 0
+        lit = None
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+
+        while True:
+            for other in clause:
+                if other == lit:
+                    continue
+                var = abs(other)
+                if var in seen or self.level[var] == 0:
+                    continue
+                seen.add(var)
+                self._bump(var)
+                if self.level[var] == current_level:
+                    pending += 1
+                else:
+                    learned.append(other)
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reason[abs(lit)]]
+
+        learned[0] = -lit
+        self.increment *= 1.05
+        if len(learned) == 1:
+            return learned, 0
+        # Watch the literal from the highest remaining level second
+        highest = max(range(1, len(learned)), key=lambda i: self.level[abs(learned[i])])
+        learned[1], learned[highest] = learned[highest], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def _backtrack(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for lit in self.trail[start:]:
+            var = abs(lit)
+            self.phase[var] = self.value[var]
+            self.value[var] = 0
+            self.reason[var] = None
+            heapq.heappush(self.order, (-self.activity[var], var))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.queue_head = len(self.trail)
+
+    def _pick_branch(self):
+        while self.order:
+            _, var = heapq.heappop(self.order)
+            if self.value[var] == 0:
+                return var if self.phase[var] == 1 else -var
+        return None
+
+    def solve(self, assumptions=()):
+        """Returns True if the clauses plus assumed literals are satisfiable."""
+        if self.inconsistent:
+            return False
+        self._backtrack(0)
+        if self._propagate() is not None:
+            self.inconsistent = True
+            return False
+
+        assumptions = list(assumptions)
+        conflicts = 0
+        restart_limit = 100
+
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                if not self.trail_lim:
+                    self.inconsistent = True
+                    return False
+                conflicts += 1
+                learned, level = self._analyze(conflict)
+                # Backjumping below the assumptions just re-decides them
+                self._backtrack(level)
+                if len(learned) == 1:
+                    self._assign(learned[0], None)
+                else:
+                    self._assign(learned[0], self._attach(learned))
+                continue
+
+            if conflicts >= restart_limit:
+                conflicts = 0
+                restart_limit = int(restart_limit * 1.5)
+                self._backtrack(0)
+                continue
+
+            # Assumptions are decided first, one per decision level
+            decision = None
+            while len(self.trail_lim) < len(assumptions):
+                lit = assumptions[len(self.trail_lim)]
+                value = self.lit_value(lit)
+                if value == -1:
+                    return False
+                self.trail_lim.append(len(self.trail))
+                if value == 0:
+                    decision = lit
+                    break
+            if decision is None:
+                decision = self._pick_branch()
+                if decision is None:
+                    return True
+                self.trail_lim.append(len(self.trail))
+            self._assign(decision, None)
+
+    def model(self):
+        """Returns {variable: bool} for the last satisfying assignment."""
+        return {var: self.value[var] == 1 for var in range(1, self.num_vars + 1)}
+
+
+class CNFEncoder():
+    """Tseitin transformation of Sentences into clauses of a SATSolver.
+
+    Every symbol gets one variable; every distinct connective gets a fresh
+    variable constrained to equal its subformula, so the clause count stays
+    linear in the size of the sentence.
+    """
+
+    def __init__(self, solver=None):
+        self.solver = solver if solver is not None else SATSolver()
+        self.variables = {}  # Symbol name -> variable
+        self.literals = {}  # Sentence -> literal
+        self.true = None
+
+    def variable(self, name):
+        if name not in self.variables:
+            self.variables[name] = self.solver.new_var()
+        return self.variables[name]
+
+    def _true(self):
+        if self.true is None:
+            self.true = self.solver.new_var()
+            self.solver.add_clause([self.true])
+        return self.true
+
+    def literal(self, sentence):
+        """Returns a literal that is true exactly when sentence is."""
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        add = self.solver.add_clause
+        if isinstance(sentence, (And, Or)):
+            operands = sentence.conjuncts if isinstance(sentence, And) else sentence.disjuncts
+            if not operands:
+                lit = self._true() if isinstance(sentence, And) else -self._true()
+            else:
+                children = [self.literal(operand) for operand in operands]
+                lit = self.solver.new_var()
+                sign = 1 if isinstance(sentence, And) else -1
+                # And: lit -> child for each child, all children -> lit
+                # Or is the same with every literal negated
+                for child in children:
+                    add([-sign * lit, sign * child])
+                add([sign * lit] + [-sign * child for child in children])
+        elif isinstance(sentence, Implication):
+            antecedent = self.literal(sentence.antecedent)
+            consequent = self.literal(sentence.consequent)
+            lit = self.solver.new_var()
+            add([-lit, -antecedent, consequent])
+            add([lit, antecedent])
+            add([lit, -consequent])
+        elif isinstance(sentence, Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            lit = self.solver.new_var()
+            add([-lit, -left, right])
+            add([-lit, left, -right])
+            add([lit, left, right])
+            add([lit, -left, -right])
+        else:
+            raise TypeError("must be a logical sentence")
+
+        self.literals[sentence] = lit
+        return lit
+
+    def assert_sentence(self, sentence, guard=None):
+        """Adds clauses requiring sentence to be true; with a guard variable,
+        only while the guard is true."""
+        extra = [] if guard is None else [-guard]
+        # Top-level conjunctions and disjunctions need no Tseitin variable
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.assert_sentence(conjunct, guard)
+        elif isinstance(sentence, Or):
+            self.solver.add_clause([self.literal(disjunct) for disjunct in sentence.disjuncts] + extra)
+        elif isinstance(sentence, Implication):
+            self.solver.add_clause([-self.literal(sentence.antecedent), self.literal(sentence.consequent)] + extra)
+        else:
+            self.solver.add_clause([self.literal(sentence)] + extra)
+
+
+def sat_check(knowledge, query):
+    """Checks if knowledge base entails query by refuting knowledge ∧ ¬query with a SAT solver."""
+    encoder = CNFEncoder()
+    encoder.assert_sentence(knowledge)
+    query = encoder.literal(query)
+    return not encoder.solver.solve([-query])
+
+
+def horn_clauses(sentence):
+    """Returns sentence as a list of (premises, conclusion) Horn clauses, or None if it is not Horn.
+
+    Premises is a tuple of symbol names; conclusion is a symbol name, or None
+    for a clause with no positive literal (such as a negative fact ¬P).
+    """
+    clauses = []
+
+    def conjunction(sentence):
+        """Returns the symbol names of a Symbol or a conjunction of Symbols, or None."""
+        if isinstance(sentence, Symbol):
+            return [sentence.name]
+        if isinstance(sentence, And):
+            names = []
+            for conjunct in sentence.conjuncts:
+                inner = conjunction(conjunct)
+                if inner is None:
+                    return None
+                names.extend(inner)
+            return names
+        return None
+
+    def collect(sentence):
+        if isinstance(sentence, Symbol):
+            clauses.append(((), sentence.name))
+        elif isinstance(sentence, Not) and isinstance(sentence.operand, Symbol):
+            clauses.append(((sentence.operand.name,), None))
+        elif isinstance(sentence, And):
+            return all(collect(conjunct) for conjunct in sentence.conjuncts)
+        elif isinstance(sentence, Implication):
+            premises = conjunction(sentence.antecedent)
+            if premises is None:
+                return False
+            consequent = sentence.consequent
+            if isinstance(consequent, Not) and isinstance(consequent.operand, Symbol):
+                clauses.append((tuple(premises) + (consequent.operand.name,), None))
+                return True
+            conclusions = conjunction(consequent)
+            if conclusions is None:
+                return False
+            clauses.extend((tuple(premises), conclusion) for conclusion in conclusions)
+        elif isinstance(sentence, Or):
+            premises = []
+            conclusion = None
+            for disjunct in sentence.disjuncts:
+                if isinstance(disjunct, Not) and isinstance(disjunct.operand, Symbol):
+                    premises.append(disjunct.operand.name)
+                elif isinstance(disjunct, Symbol) and conclusion is None:
+                    conclusion = disjunct.name
+                else:
+                    return False
+            clauses.append((tuple(premises), conclusion))
+        else:
+            return False
+        return True
+
+    return clauses if collect(sentence) else None
+
+
+class ForwardChainer():
+    """Incremental counter-based forward chaining (PL-FC-Entails) over Horn clauses.
+
+    Each clause keeps a count of premises not yet inferred; a clause fires
+    when its count reaches zero. Adding clauses continues from the current
+    state, so the total work stays linear in the size of all clauses added.
+    """
+
+    def __init__(self):
+        self.conclusions = []
+        self.count = []
+        self.watching = {}  # Premise name -> indices of the clauses waiting on it
+        self.inferred = set()
+        self.consistent = True
+
+    def add(self, premises, conclusion):
+        """Adds the clause premises => conclusion (conclusion None: the premises are false)."""
+        index = len(self.conclusions)
+        missing = set(premises) - self.inferred
+        self.conclusions.append(conclusion)
+        self.count.append(len(missing))
+        for premise in missing:
+            self.watching.setdefault(premise, []).append(index)
+        if not missing:
+            self._fire(conclusion)
+
+    def _fire(self, conclusion):
+        agenda = [conclusion]
+        while agenda and self.consistent:
+            name = agenda.pop()
+            if name is None:
+                self.consistent = False
+            elif name not in self.inferred:
+                self.inferred.add(name)
+                for index in self.watching.pop(name, ()):
+                    self.count[index] -= 1
+                    if self.count[index] == 0:
+                        agenda.append(self.conclusions[index])
+
+
+def forward_chain(clauses, facts=()):
+    """Forward chaining over Horn clauses plus extra facts.
+
+    Returns the set of symbol names they entail, or None if they are
+    inconsistent (a clause without a conclusion fires). Runs in time linear
+    in the total size of the clauses.
+    """
+    chainer = ForwardChainer()
+    for fact in facts:
+        chainer.add((), fact)
+    for premises, conclusion in clauses:
+        chainer.add(premises, conclusion)
+        if not chainer.consistent:
+            return None
+    return chainer.inferred
+
+
+def horn_entails(clauses, query):
+    """Checks if Horn clauses entail a literal or conjunction of literals.
+
+    Returns None when the query is not of that form.
+    """
+    inferred = forward_chain(clauses)
+    if inferred is None:
+        return True  # An inconsistent knowledge base entails everything
+    if isinstance(query, Symbol):
+        return query.name in inferred
+    if isinstance(query, Not) and isinstance(query.operand, Symbol):
+        # knowledge ⊨ ¬P exactly when knowledge ∧ P is inconsistent
+        return forward_chain(clauses, [query.operand.name]) is None
+    if isinstance(query, And):
+        results = [horn_entails(clauses, conjunct) for conjunct in query.conjuncts]
+        return None if None in results else all(results)
+    return None
+
+
+def entails(knowledge, query):
+    """Checks if knowledge base entails query.
+
+    Uses forward chaining when the knowledge base is Horn and the query is a
+    literal or a conjunction of literals, and sat_check otherwise.
+    """
+    clauses = horn_clauses(knowledge)
+    if clauses is not None:
+        result = horn_entails(clauses, query)
+        if result is not None:
+            return result
+    return sat_check(knowledge, query)
+
+
+class KnowledgeBase():
+    """A knowledge base that keeps its inference state between queries.
+
+    While every told sentence is Horn, a ForwardChainer holds everything the
+    knowledge base entails, and literal queries are set lookups. Otherwise
+    the sentences live in one SATSolver, each guarded by its own activation
+    variable: retracting a sentence turns its guard off, and clauses learned
+    for earlier queries carry over to later ones.
+    """
+
+    def __init__(self, *sentences):
+        self.sentences = {}  # Sentence -> Horn clauses, or None if not Horn
+        self.guards = {}  # Sentence -> activation variable in the solver
+        self.encoder = None
+        self.chainer = None
+        for sentence in sentences:
+            self.tell(sentence)
+
+    def __contains__(self, sentence):
+        return sentence in self.sentences
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def tell(self, sentence):
+        """Adds sentence to the knowledge base."""
+        Sentence.validate(sentence)
+        if sentence in self.sentences:
+            return
+        clauses = horn_clauses(sentence)
+        self.sentences[sentence] = clauses
+        if self.chainer is not None and clauses is not None:
+            for premises, conclusion in clauses:
+                self.chainer.add(premises, conclusion)
+        else:
+            self.chainer = None
+        if self.encoder is not None:
+            self._encode(sentence)
+
+    def retract(self, sentence):
+        """Removes a previously told sentence."""
+        if sentence not in self.sentences:
+            raise ValueError(f"{sentence} was not told to the knowledge base")
+        del self.sentences[sentence]
+        self.chainer = None
+        guard = self.guards.pop(sentence, None)
+        if guard is not None:
+            self.encoder.solver.add_clause([-guard])
+
+    def consistent(self):
+        """Checks if the knowledge base has a model."""
+        if self.is_horn():
+            return self._horn_chainer().consistent
+        solver = self._solver()
+        return solver.solve([self.guards[sentence] for sentence in self.sentences])
+
+    def is_horn(self):
+        return all(clauses is not None for clauses in self.sentences.values())
+
+    def _horn_chainer(self):
+        if self.chainer is None:
+            self.chainer = ForwardChainer()
+            for clauses in self.sentences.values():
+                for premises, conclusion in clauses:
+                    self.chainer.add(premises, conclusion)
+        return self.chainer
+
+    def _horn_ask(self, query):
+        """Answers a literal or conjunction of literals by forward chaining; None for other queries."""
+        chainer = self._horn_chainer()
+        if not chainer.consistent:
+            return True
+        if isinstance(query, Symbol):
+            return query.name in chainer.inferred
+        if isinstance(query, Not) and isinstance(query.operand, Symbol):
+            if query.operand.name in chainer.inferred:
+                return False
+            # knowledge ⊨ ¬P exactly when knowledge ∧ P is inconsistent
+            clauses = [clause for clauses in self.sentences.values() for clause in clauses]
+            return forward_chain(clauses, [query.operand.name]) is None
+        if isinstance(query, And):
+            results = [self._horn_ask(conjunct) for conjunct in query.conjuncts]
+            return None if None in results else all(results)
+        return None
+
+    def _encode(self, sentence):
+        guard = self.encoder.solver.new_var()
+        self.guards[sentence] = guard
+        self.encoder.assert_sentence(sentence, guard)
+
+    def _solver(self):
+        if self.encoder is None:
+            self.encoder = CNFEncoder()
+            for sentence in self.sentences:
+                self._encode(sentence)
+        return self.encoder.solver
+
+    def _refutable(self, query, guards):
+        """Returns a model of the knowledge base where query is false, or None."""
+        solver = self._solver()
+        if solver.solve(guards + [-self.encoder.literal(query)]):
+            model = solver.model()
+            return {name: model[var] for name, var in self.encoder.variables.items()}
+        return None
+
+    def ask(self, query):
+        """Checks if the knowledge base entails query."""
+        return self.ask_all([query])[0]
+
+    def ask_all(self, queries):
+        """Checks a batch of queries; returns one bool per query.
+
+        Models found while refuting one query are reused to refute the
+        others without calling the solver.
+        """
+        queries = list(queries)
+        for query in queries:
+            Sentence.validate(query)
+        results = [None] * len(queries)
+        if self.is_horn():
+            results = [self._horn_ask(query) for query in queries]
+            if None not in results:
+                return results
+
+        guards = None
+        models = []
+        for i, query in enumerate(queries):
+            if results[i] is not None:
+                continue
+            if any(not query.evaluate(_complete(model, query)) for model in models):
+                results[i] = False
+                continue
+            if guards is None:
+                self._solver()
+                guards = [self.guards[sentence] for sentence in self.sentences]
+            model = self._refutable(query, guards)
+            if model is None:
+                results[i] = True
+            else:
+                models.append(model)
+                results[i] = False
+        return results
+
+
+
+def conjuncts(sentence):
+    """Returns the sentences a top-level (possibly nested) conjunction is made of."""
+    if not isinstance(sentence, And):
+        return [sentence]
+    result = []
+    for conjunct in sentence.conjuncts:
+        result.extend(conjuncts(conjunct))
+    return result
+
+
+def components(sentences):
+    """Groups sentences into components that share no symbols.
+
+    Returns a list of (symbol names, sentences) pairs; sentences without
+    symbols form one component with an empty symbol set.
+    """
+    parent = {}
+
+    def find(name):
+        root = name
+        while parent[root] != root:
+            root = parent[root]
+        while parent[name] != root:
+            parent[name], name = root, parent[name]
+        return root
+
+    for sentence in sentences:
+        names = iter(sentence.symbol_set())
+        first = next(names, None)
+        if first is None:
+            continue
+        parent.setdefault(first, first)
+        for name in names:
+            parent.setdefault(name, name)
+            parent[find(name)] = find(first)
+
+    groups = {}
+    for sentence in sentences:
+        names = sentence.symbol_set()
+        root = find(next(iter(names))) if names else None
+        group = groups.setdefault(root, (set(), []))
+        group[0].update(names)
+        group[1].append(sentence)
+    return list(groups.values())
+
+
+class DecomposedKnowledge():
+    """A knowledge base split into independent components.
+
+    Each query is answered by the components sharing symbols with it; the
+    others only have to be consistent, which is checked once per component.
+    Work grows with the size of the largest relevant component rather than
+    with the whole knowledge base.
+    """
+
+    def __init__(self, knowledge):
+        self.components = []
+        self.component_of = {}  # Symbol name -> component index
+        for names, sentences in components(conjuncts(knowledge)):
+            for name in names:
+                self.component_of[name] = len(self.components)
+            self.components.append(KnowledgeBase(*sentences))
+        self.merged = {}  # Tuple of component indices -> combined KnowledgeBase
+        self.inconsistent = None
+
+    def _inconsistent(self):
+        """Returns the indices of components without a model, checking each component once."""
+        if self.inconsistent is None:
+            self.inconsistent = [
+                index for index, knowledge in enumerate(self.components) if not knowledge.consistent()
+            ]
+        return self.inconsistent
+
+    def _relevant(self, query):
+        indices = tuple(sorted({
+            self.component_of[name] for name in query.symbol_set() if name in self.component_of
+        }))
+        if len(indices) == 1:
+            return indices, self.components[indices[0]]
+        if indices not in self.merged:
+            sentences = [sentence for index in indices for sentence in self.components[index].sentences]
+            self.merged[indices] = KnowledgeBase(*sentences)
+        return indices, self.merged[indices]
+
+    def ask(self, query):
+        """Checks if the knowledge base entails query."""
+        return self.ask_all([query])[0]
+
+    def ask_all(self, queries):
+        """Checks a batch of queries; queries on the same components share one ask_all()."""
+        queries = list(queries)
+        results = [None] * len(queries)
+        batches = {}
+        for i, query in enumerate(queries):
+            Sentence.validate(query)
+            indices, knowledge = self._relevant(query)
+            # An inconsistent component anywhere entails everything
+            if any(index not in indices for index in self._inconsistent()):
+                results[i] = True
+                continue
+            batches.setdefault(indices, (knowledge, []))[1].append(i)
+        for knowledge, positions in batches.values():
+            for i, result in zip(positions, knowledge.ask_all([queries[i] for i in positions])):
+                results[i] = result
+        return results
+
+
+def decomposed_check(knowledge, query):
+    """Checks if knowledge base entails query using only the components query depends on."""
+    return DecomposedKnowledge(knowledge).ask(query)
+
+
+def _complete(model, sentence):
+    """Extends a model with False for symbols of sentence it does not assign."""
+    missing = sentence.symbol_set().difference(model)
+    if not missing:
+        return model
+    return {**model, **{name: False for name in missing}}
@@ -0,0 +1,55 @@
+import random
+
+from logic import *
+from bdd import CompiledKnowledge
+from test_logic import random_sentence
+from test_truth_table import models
+from truth_table import count_models
+
+
+def test_bdd_matches_truth_table():
+    rng = random.Random(8)
+    for _ in range(300):
+        knowledge = random_sentence(rng, 4)
+        names = sorted(knowledge.symbols())
+        compiled = CompiledKnowledge(knowledge)
+        for model in models(names):
+            assert compiled.bdd.evaluate(compiled.root, model) == knowledge.evaluate(model), knowledge
+        assert compiled.count(names) == count_models(knowledge, names), knowledge
+        assert compiled.count(names + ["Z"]) == count_models(knowledge, names + ["Z"]), knowledge
+        queries = [random_sentence(rng, 2) for _ in range(3)]
+        assert compiled.ask_all(queries) == [model_check(knowledge, query) for query in queries], (knowledge, queries)
+
+        facts = {name: rng.random() < 0.5 for name in rng.sample(names, min(2, len(names)))}
+        conditioned = compiled.condition(facts)
+        assignment = And(*[Symbol(name) if value else Not(Symbol(name)) for name, value in facts.items()])
+        assert conditioned.satisfiable() == any(
+            And(knowledge, assignment).evaluate(model) for model in models(names)
+        ), (knowledge, facts)
+
+
+def test_bdd_symbol_free_conjuncts():
+    compiled = CompiledKnowledge(And(Symbol("A"), Or()))
+    assert not compiled.satisfiable()
+    assert compiled.count(["A"]) == 0
+    compiled = CompiledKnowledge(And(Symbol("A"), And()))
+    assert compiled.count() == 1
+
+
+def test_bdd_save_load(tmp_path):
+    knowledge = random_sentence(random.Random(9), 4)
+    compiled = CompiledKnowledge(knowledge)
+    compiled.save(tmp_path / "knowledge.bdd")
+    loaded = CompiledKnowledge.load(tmp_path / "knowledge.bdd")
+    assert loaded.count() == compiled.count()
+    assert len(loaded) == len(compiled)
+    assert loaded.bdd.order == compiled.bdd.order
+
+
+def test_bdd_count_ignores_query_symbols(tmp_path):
+    compiled = CompiledKnowledge(Or(Symbol("A"), Symbol("B")))
+    compiled.ask_all([Or(Symbol("C"), Symbol("D")), And(Symbol("A"), Symbol("E"))])
+    assert compiled.count() == 3
+    assert compiled.condition({"A": False}).count() == 2
+    compiled.save(tmp_path / "knowledge.bdd")
+    assert CompiledKnowledge.load(tmp_path / "knowledge.bdd").count() == 3
@@ -0,0 +1,43 @@
+import io
+import json
+import random
+
+from check_violations import check_driver
+from columnar import TrafficColumns, write_report
+
+
+def random_records(rng, drivers=4, days=4):
+    records = []
+    for driver in range(drivers):
+        for day in range(1, days + 1):
+            # Repeated driver-days may disagree, which makes that driver's
+            # knowledge base inconsistent
+            for _ in range(rng.choice([1, 1, 1, 2])):
+                records.append({
+                    "Driver": f"Driver{driver}",
+                    "Day": day,
+                    "Speed_Limit": rng.choice([40, 60, "No Limit"]),
+                    "Speed": rng.randint(30, 80),
+                    "Signal": rng.choice(["Red", "Green"]),
+                    "Locations": ["Intersection"] * rng.randint(1, 2),
+                    "Violation": "",
+                })
+    rng.shuffle(records)
+    return records
+
+
+def test_columnar_matches_check_driver():
+    rng = random.Random(10)
+    for _ in range(100):
+        records = random_records(rng)
+        output = io.StringIO()
+        write_report(TrafficColumns.from_records(records), output)
+        report = [json.loads(line) for line in output.getvalue().splitlines()]
+
+        expected = {}
+        for driver in {record["Driver"] for record in records}:
+            entries = [record for record in records if record["Driver"] == driver]
+            expected[driver] = iter(check_driver(driver, entries, source="telemetry"))
+        for record, row in zip(records, report):
+            day, violation = next(expected[record["Driver"]])
+            assert (row["Driver"], row["Day"], row["Violation"]) == (record["Driver"], day, violation), records
@@ -0,0 +1,128 @@
+import itertools
+import random
+
+from logic import *
+
+# Every engine is checked against model_check (or brute force) on seeded
+# random inputs, so a failure names the seed and the case to reproduce it
+
+SYMBOLS = [Symbol(name) for name in "ABCDEFG"]
+
+
+def random_literal(rng, symbols=SYMBOLS):
+    symbol = rng.choice(symbols)
+    return Not(symbol) if rng.random() < 0.3 else symbol
+
+
+def random_sentence(rng, depth, symbols=SYMBOLS):
+    if depth == 0 or rng.random() < 0.25:
+        return random_literal(rng, symbols)
+    kind = rng.choice([Not, And, Or, Implication, Biconditional])
+    if kind is Not:
+        return Not(random_sentence(rng, depth - 1, symbols))
+    if kind in (And, Or):
+        return kind(*[random_sentence(rng, depth - 1, symbols) for _ in range(rng.randint(1, 3))])
+    return kind(random_sentence(rng, depth - 1, symbols), random_sentence(rng, depth - 1, symbols))
+
+
+def random_horn(rng):
+    """A random conjunction of facts, definite rules and negative clauses."""
+    parts = []
+    for _ in range(rng.randint(1, 8)):
+        kind = rng.random()
+        if kind < 0.3:
+            parts.append(random_literal(rng))
+        elif kind < 0.7:
+            body = rng.sample(SYMBOLS, rng.randint(1, 3))
+            head = rng.choice(SYMBOLS)
+            parts.append(Implication(And(*body) if len(body) > 1 else body[0], Not(head) if rng.random() < 0.15 else head))
+        else:
+            disjuncts = [Not(symbol) for symbol in rng.sample(SYMBOLS, rng.randint(0, 3))]
+            if rng.random() < 0.7:
+                disjuncts.append(rng.choice(SYMBOLS))
+            if disjuncts:
+                parts.append(Or(*disjuncts))
+    return And(*parts) if parts else random_literal(rng)
+
+
+def test_sat_check_matches_model_check():
+    rng = random.Random(1)
+    for _ in range(1500):
+        knowledge, query = random_sentence(rng, 3), random_sentence(rng, 2)
+        assert sat_check(knowledge, query) == model_check(knowledge, query), (knowledge, query)
+
+
+def test_sat_solver_matches_brute_force():
+    rng = random.Random(2)
+    for _ in range(500):
+        variables = rng.randint(1, 8)
+        clauses = [
+            [rng.choice([-1, 1]) * rng.randint(1, variables) for _ in range(rng.randint(1, 3))]
+            for _ in range(rng.randint(1, 5 * variables))
+        ]
+        expected = any(
+            all(any(values[abs(lit) - 1] == (lit > 0) for lit in clause) for clause in clauses)
+            for values in itertools.product([False, True], repeat=variables)
+        )
+        solver = SATSolver()
+        for _ in range(variables):
+            solver.new_var()
+        for clause in clauses:
+            solver.add_clause(clause)
+        assert solver.solve() == expected, clauses
+        if expected:
+            model = solver.model()
+            assert all(any(model[abs(lit)] == (lit > 0) for lit in clause) for clause in clauses), clauses
+
+
+def test_solver_assumptions_reuse_one_encoding():
+    rng = random.Random(3)
+    for _ in range(200):
+        knowledge = random_sentence(rng, 3)
+        encoder = CNFEncoder()
+        encoder.assert_sentence(knowledge)
+        for _ in range(5):
+            query = random_sentence(rng, 2)
+            assert (not encoder.solver.solve([-encoder.literal(query)])) == model_check(knowledge, query), (knowledge, query)
+
+
+def test_horn_entailment_matches_model_check():
+    rng = random.Random(4)
+    for _ in range(2000):
+        knowledge = random_horn(rng)
+        assert horn_clauses(knowledge) is not None, knowledge
+        query = rng.choice([random_literal(rng), And(random_literal(rng), random_literal(rng)),
+                            Or(random_literal(rng), random_literal(rng))])
+        assert entails(knowledge, query) == model_check(knowledge, query), (knowledge, query)
+
+
+def test_knowledge_base_matches_model_check():
+    rng = random.Random(6)
+    for _ in range(150):
+        knowledge = KnowledgeBase()
+        told = []
+        for _ in range(10):
+            if rng.random() < 0.6 or not told:
+                sentence = random_horn(rng) if rng.random() < 0.6 else random_sentence(rng, 2)
+                knowledge.tell(sentence)
+                if sentence not in told:
+                    told.append(sentence)
+            else:
+                sentence = rng.choice(told)
+                knowledge.retract(sentence)
+                told.remove(sentence)
+            queries = [random_sentence(rng, 2) for _ in range(3)]
+            expected = [model_check(And(*told), query) for query in queries]
+            assert knowledge.ask_all(queries) == expected, (told, queries)
+            assert knowledge.ask(queries[0]) == expected[0], (told, queries[0])
+
+
+def test_decomposed_knowledge_matches_model_check():
+    rng = random.Random(7)
+    for _ in range(500):
+        parts = [random_sentence(rng, 2, rng.sample(SYMBOLS, 2)) for _ in range(rng.randint(1, 5))]
+        knowledge = And(*parts)
+        queries = [random_sentence(rng, 1) for _ in range(4)]
+        expected = [model_check(knowledge, query) for query in queries]
+        assert DecomposedKnowledge(knowledge).ask_all(queries) == expected, (knowledge, queries)
+        assert decomposed_check(knowledge, queries[0]) == expected[0], (knowledge, queries[0])
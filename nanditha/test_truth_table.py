@@ -0,0 +1,24 @@
+import itertools
+import random
+
+from logic import model_check
+from test_logic import random_sentence
+from truth_table import CompiledSentence, truth_table_check
+
+
+def models(names):
+    for values in itertools.product([False, True], repeat=len(names)):
+        yield dict(zip(names, values))
+
+
+def test_truth_table_matches_evaluate():
+    rng = random.Random(5)
+    for _ in range(500):
+        sentence = random_sentence(rng, 4)
+        names = sorted(sentence.symbols())
+        compiled = CompiledSentence(sentence, names)
+        expected = [sentence.evaluate(model) for model in models(names)]
+        assert list(compiled.evaluate_models(models(names))) == expected, sentence
+        assert compiled.count_models(chunk_bits=3) == compiled.count_models() == sum(expected), sentence
+        query = random_sentence(rng, 2)
+        assert truth_table_check(sentence, query, chunk_bits=3) == model_check(sentence, query), (sentence, query)
@@ -0,0 +1,183 @@
+import numpy as np
+
+from logic import And, Biconditional, EvaluationException, Implication, Not, Or, Symbol
+
+WORD_BITS = 64
+ALL_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+# Bit b of PATTERNS[i] is bit i of b, so the 64 rows in one word enumerate the
+# six lowest symbols; higher symbols are constant across a word
+PATTERNS = [
+    np.uint64(sum(1 << bit for bit in range(WORD_BITS) if bit >> i & 1))
+    for i in range(6)
+]
+
+
+def _popcount(words):
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(words).sum())
+    return int(np.unpackbits(words.view(np.uint8)).sum())
+
+
+class CompiledSentence():
+    """A Sentence compiled into a straight-line program of NumPy bitwise operations.
+
+    Every symbol is a bit-plane: an integer array whose bits hold the symbol's
+    value in one model each, so a single program run evaluates the sentence
+    in as many models as there are bits. Equal subformulas are computed once
+    and registers are reused once their last reader has run.
+    """
+
+    def __init__(self, sentence, symbols=None):
+        if symbols is None:
+            symbols = sorted(sentence.symbols())
+        self.symbols = list(symbols)
+        self.program = []  # (operation, output register, input registers)
+        self.registers = len(self.symbols)
+
+        nodes = {}
+        position = {name: i for i, name in enumerate(self.symbols)}
+
+        def emit(operation, inputs):
+            self.program.append([operation, None, inputs])
+            return len(self.program) - 1 + len(self.symbols)
+
+        def compile_node(sentence):
+            if isinstance(sentence, Symbol):
+                if sentence.name not in position:
+                    raise ValueError(f"symbol {sentence.name} not in symbols")
+                return position[sentence.name]
+            if sentence in nodes:
+                return nodes[sentence]
+            if isinstance(sentence, Not):
+                node = emit("not", [compile_node(sentence.operand)])
+            elif isinstance(sentence, And):
+                node = emit("and", [compile_node(conjunct) for conjunct in sentence.conjuncts])
+            elif isinstance(sentence, Or):
+                node = emit("or", [compile_node(disjunct) for disjunct in sentence.disjuncts])
+            elif isinstance(sentence, Implication):
+                node = emit("implies", [compile_node(sentence.antecedent), compile_node(sentence.consequent)])
+            elif isinstance(sentence, Biconditional):
+                node = emit("iff", [compile_node(sentence.left), compile_node(sentence.right)])
+            else:
+                raise TypeError("must be a logical sentence")
+            nodes[sentence] = node
+            return node
+
+        output = compile_node(sentence)
+        self._allocate(output)
+
+    def _allocate(self, output):
+        """Maps program values onto as few registers as possible."""
+        first = len(self.symbols)
+        last_use = {}
+        for step, (_, _, inputs) in enumerate(self.program):
+            for value in inputs:
+                last_use[value] = step
+        last_use[output] = len(self.program)
+
+        register = {value: value for value in range(first)}
+        free = []
+        for step, instruction in enumerate(self.program):
+            for value in set(instruction[2]):
+                if value >= first and last_use[value] == step:
+                    free.append(register[value])
+            instruction[2] = [register[value] for value in instruction[2]]
+            if free:
+                register[first + step] = free.pop()
+            else:
+                register[first + step] = self.registers
+                self.registers += 1
+            instruction[1] = register[first + step]
+        self.output = register[output]
+
+    def run(self, planes, like=None):
+        """Evaluates the sentence on one bit-plane per symbol (arrays of one shape and integer dtype).
+        like gives the shape and dtype when there are no symbols."""
+        if len(planes) != len(self.symbols):
+            raise ValueError(f"expected {len(self.symbols)} bit-planes, got {len(planes)}")
+        template = planes[0] if planes else like
+        registers = list(planes) + [np.empty_like(template) for _ in range(self.registers - len(planes))]
+
+        for operation, out, inputs in self.program:
+            target = registers[out]
+            if operation == "not":
+                np.invert(registers[inputs[0]], out=target)
+            elif operation == "and" or operation == "or":
+                if not inputs:
+                    target[...] = 0
+                    if operation == "and":
+                        np.invert(target, out=target)
+                    continue
+                # The output may reuse an input's register; start from that input
+                inputs = sorted(inputs, key=lambda value: value != out)
+                combine = np.bitwise_and if operation == "and" else np.bitwise_or
+                np.copyto(target, registers[inputs[0]])
+                for value in inputs[1:]:
+                    combine(target, registers[value], out=target)
+            elif operation == "implies":
+                np.bitwise_or(np.invert(registers[inputs[0]]), registers[inputs[1]], out=target)
+            else:
+                np.invert(np.bitwise_xor(registers[inputs[0]], registers[inputs[1]]), out=target)
+        return registers[self.output]
+
+    def truth_table(self, chunk_bits=20):
+        """Yields (first row, packed uint64 results) over all 2^n assignments.
+
+        Row r assigns symbols[i] the value of bit i of r. Each chunk covers at
+        most 2^chunk_bits rows, which bounds memory regardless of n.
+        """
+        n = len(self.symbols)
+        rows = 1 << n
+        words = max(1, rows // WORD_BITS)
+        chunk_words = max(1, (1 << chunk_bits) // WORD_BITS)
+        mask = ALL_ONES if rows >= WORD_BITS else np.uint64((1 << rows) - 1)
+
+        for start in range(0, words, chunk_words):
+            word_index = np.arange(start, min(start + chunk_words, words), dtype=np.uint64)
+            planes = []
+            for i in range(n):
+                if i < 6:
+                    planes.append(np.full(len(word_index), PATTERNS[i], dtype=np.uint64))
+                else:
+                    bit = (word_index >> np.uint64(i - 6)) & np.uint64(1)
+                    planes.append(np.where(bit == 1, ALL_ONES, np.uint64(0)))
+            result = self.run(planes, like=word_index)
+            yield start * WORD_BITS, result & mask
+
+    def count_models(self, chunk_bits=20):
+        """Returns the number of assignments to the symbols that satisfy the sentence."""
+        return sum(_popcount(result) for _, result in self.truth_table(chunk_bits))
+
+    def satisfiable(self, chunk_bits=20):
+        return any(result.any() for _, result in self.truth_table(chunk_bits))
+
+    def evaluate_models(self, models, chunk_size=1 << 16):
+        """Evaluates the sentence in a batch of models (dicts of symbol name -> bool).
+        Returns a NumPy bool array with one entry per model."""
+        models = list(models)
+        results = []
+        for start in range(0, len(models), chunk_size):
+            chunk = models[start:start + chunk_size]
+            try:
+                planes = [
+                    np.packbits(np.fromiter((bool(model[name]) for model in chunk), dtype=bool, count=len(chunk)))
+                    for name in self.symbols
+                ]
+            except KeyError as error:
+                raise EvaluationException(f"variable {error.args[0]} not in model")
+            packed = self.run(planes, like=np.zeros((len(chunk) + 7) // 8, dtype=np.uint8))
+            results.append(np.unpackbits(packed, count=len(chunk)).astype(bool))
+        return np.concatenate(results) if results else np.zeros(0, dtype=bool)
+
+
+def count_models(sentence, symbols=None, chunk_bits=20):
+    """Counts the models of sentence over symbols (default: its own symbols)."""
+    return CompiledSentence(sentence, symbols).count_models(chunk_bits)
+
+
+def truth_table_check(knowledge, query, chunk_bits=20):
+    """Checks if knowledge base entails query by evaluating knowledge ∧ ¬query
+    over the whole truth table, 2^chunk_bits rows at a time."""
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    return not CompiledSentence(And(knowledge, Not(query)), symbols).satisfiable(chunk_bits)
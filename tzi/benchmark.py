@@ -0,0 +1,345 @@
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+
+from routeplanning import CSRGraph, search
+from landmarks import Landmarks
+from incremental import DStarLite
+
+FORMAT_VERSION = 1
+
+# Algorithm name -> whether it takes a heuristic
+ALGORITHMS = {
+    "bfs": False,
+    "dfs": False,
+    "gbfs": True,
+    "a_star": True,
+    "bidirectional_dijkstra": False,
+    "bidirectional_a_star": True,
+}
+
+
+# Straight-line distance heuristic for the geometric generators. Node names
+# are 0..n-1, which CSRGraph keeps as ids, so coordinates index by either.
+class EuclideanHeuristic:
+    def __init__(self, graph, xs, ys, target):
+        self.names = graph.names
+        self.index = graph.index
+        self.xs, self.ys = xs, ys
+        target = graph.index[target]
+        self.tx, self.ty = xs[target], ys[target]
+
+    def __getitem__(self, name):
+        return self.estimate(self.index[name])
+
+    def estimate(self, node):
+        return math.hypot(self.xs[node] - self.tx, self.ys[node] - self.ty)
+
+
+# Graph generators: each returns (graph, coordinates or None), seeded so the
+# same size and seed always produce the same graph. Weights are never below
+# the straight-line distance, so EuclideanHeuristic stays admissible.
+def grid_graph(nodes, seed=0):
+    rng = random.Random(seed)
+    side = max(2, math.isqrt(nodes))
+    xs = array("d", (i % side for i in range(side * side)))
+    ys = array("d", (i // side for i in range(side * side)))
+
+    def edges():
+        for y in range(side):
+            for x in range(side):
+                node = y * side + x
+                if x + 1 < side:
+                    yield node, node + 1, rng.uniform(1, 2)
+                if y + 1 < side:
+                    yield node, node + side, rng.uniform(1, 2)
+
+    return CSRGraph.from_edges(edges()), (xs, ys)
+
+
+def geometric_graph(nodes, seed=0, degree=8):
+    rng = random.Random(seed)
+    xs = array("d", (rng.random() for _ in range(nodes)))
+    ys = array("d", (rng.random() for _ in range(nodes)))
+    radius = math.sqrt(degree / (math.pi * nodes))
+
+    # Bucket points into radius-sized cells so only neighboring cells are compared
+    cells = {}
+    for node in range(nodes):
+        cells.setdefault((int(xs[node] / radius), int(ys[node] / radius)), []).append(node)
+
+    def edges():
+        # Chain consecutive nodes too, so every query has a route
+        for node in range(nodes - 1):
+            yield node, node + 1, 1.5 * math.hypot(xs[node] - xs[node + 1], ys[node] - ys[node + 1])
+        for (cx, cy), members in cells.items():
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for node in members:
+                        for other in cells.get((cx + dx, cy + dy), ()):
+                            if node < other:
+                                distance = math.hypot(xs[node] - xs[other], ys[node] - ys[other])
+                                if distance <= radius:
+                                    yield node, other, distance * rng.uniform(1, 1.2)
+
+    return CSRGraph.from_edges(edges()), (xs, ys)
+
+
+def scale_free_graph(nodes, seed=0, attach=2):
+    # Barabasi-Albert preferential attachment
+    rng = random.Random(seed)
+    endpoints = list(range(attach + 1))
+
+    def edges():
+        for node in range(attach + 1):
+            for other in range(node + 1, attach + 1):
+                yield node, other, rng.uniform(1, 10)
+        for node in range(attach + 1, nodes):
+            chosen = set()
+            while len(chosen) < attach:
+                chosen.add(rng.choice(endpoints))
+            for other in chosen:
+                endpoints.extend((node, other))
+                yield node, other, rng.uniform(1, 10)
+
+    return CSRGraph.from_edges(edges()), None
+
+
+GENERATORS = {
+    "grid": grid_graph,
+    "geometric": geometric_graph,
+    "scale_free": scale_free_graph,
+}
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def summarize(times):
+    return {
+        "runs": len(times),
+        "mean": sum(times) / len(times),
+        "min": min(times),
+        "p50": percentile(times, 0.50),
+        "p90": percentile(times, 0.90),
+        "p99": percentile(times, 0.99),
+        "max": max(times),
+    }
+
+
+def benchmark_graph(family, nodes, algorithms, queries, repeats, seed):
+    """Benchmarks every algorithm on one generated graph."""
+    start_time = time.perf_counter()
+    graph, coordinates = GENERATORS[family](nodes, seed)
+    build_time = time.perf_counter() - start_time
+
+    rng = random.Random(seed)
+    pairs = [tuple(rng.sample(graph.names, 2)) for _ in range(queries)]
+
+    start_time = time.perf_counter()
+    if coordinates is None:
+        landmarks = Landmarks.build(graph, count=8, seed=seed)
+        heuristics = {pair: (landmarks.heuristic(pair[1]), landmarks.heuristic_from(pair[0]))
+                      for pair in pairs}
+        heuristic_name = "alt"
+    else:
+        xs, ys = coordinates
+        heuristics = {pair: (EuclideanHeuristic(graph, xs, ys, pair[1]),
+                             EuclideanHeuristic(graph, xs, ys, pair[0]))
+                      for pair in pairs}
+        heuristic_name = "euclidean"
+    heuristic_time = time.perf_counter() - start_time
+
+    results = {}
+    for algorithm in algorithms:
+        times = []
+        totals = {"nodes_expanded": 0, "peak_frontier": 0, "edges_relaxed": 0}
+        peak_memory = 0
+        for pair in pairs:
+            heuristic, reverse_heuristic = heuristics[pair] if ALGORITHMS[algorithm] else (None, None)
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                _, _, stats = search(graph, pair[0], pair[1], algorithm, heuristic, reverse_heuristic)
+                times.append(time.perf_counter() - start_time)
+            for key in totals:
+                totals[key] += stats[key]
+
+            # Memory is measured on a separate run: tracing skews the timings
+            tracemalloc.start()
+            search(graph, pair[0], pair[1], algorithm, heuristic, reverse_heuristic)
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        results[algorithm] = {
+            "seconds": summarize(times),
+            "peak_memory_bytes": peak_memory,
+            **{f"mean_{key}": value / len(pairs) for key, value in totals.items()},
+        }
+
+    return {
+        "family": family,
+        "nodes": len(graph),
+        "edges": graph.num_edges(),
+        "seed": seed,
+        "queries": queries,
+        "repeats": repeats,
+        "build_seconds": build_time,
+        "heuristic": heuristic_name,
+        "heuristic_seconds": heuristic_time,
+        "algorithms": results,
+    }
+
+
+def benchmark_replanning(family, nodes, rounds, changes=4, seed=0):
+    """Times D* Lite repairs against full A* replanning under weight increases."""
+    graph, coordinates = GENERATORS[family](nodes, seed)
+    rng = random.Random(seed)
+    start, goal = rng.sample(graph.names, 2)
+
+    # Weights only ever go up below, so landmark bounds stay admissible
+    if coordinates is None:
+        landmarks = Landmarks.build(graph, count=8, seed=seed)
+        bound = landmarks  # D* Lite reads its bounds from node ids
+        heuristic = landmarks.heuristic(goal)
+    else:
+        xs, ys = coordinates
+        bound = lambda a, b: math.hypot(xs[a] - xs[b], ys[a] - ys[b])
+        heuristic = EuclideanHeuristic(graph, xs, ys, goal)
+
+    planner = DStarLite(graph, start, goal, bound)
+    start_time = time.perf_counter()
+    path, _ = planner.plan()
+    initial_time = time.perf_counter() - start_time
+
+    incremental_times, full_times = [], []
+    incremental_expanded = full_expanded = 0
+    for _ in range(rounds):
+        for i in range(changes):
+            # Half of the changes hit the current route, the rest land anywhere
+            if path and len(path) > 1 and i % 2 == 0:
+                position = rng.randrange(len(path) - 1)
+                node1, node2 = path[position], path[position + 1]
+            else:
+                node1 = rng.randrange(len(graph))
+                row = graph.offsets[node1], graph.offsets[node1 + 1]
+                if row[0] == row[1]:
+                    continue
+                node2 = graph.targets[rng.randrange(*row)]
+                node1, node2 = graph.names[node1], graph.names[node2]
+            weight = max(weight for neighbor, weight in graph.neighbors(graph.index[node1])
+                         if neighbor == graph.index[node2])
+            planner.update_edge(node1, node2, weight * rng.uniform(1.2, 3))
+
+        start_time = time.perf_counter()
+        path, cost = planner.plan()
+        incremental_times.append(time.perf_counter() - start_time)
+        incremental_expanded += planner.nodes_expanded
+
+        start_time = time.perf_counter()
+        _, full_cost, stats = search(graph, start, goal, "a_star", heuristic)
+        full_times.append(time.perf_counter() - start_time)
+        full_expanded += stats["nodes_expanded"]
+        if full_cost is not None and abs(full_cost - cost) > 1e-6 * max(1, full_cost):
+            raise AssertionError(f"D* Lite cost {cost} differs from A* cost {full_cost}")
+
+    return {
+        "family": family,
+        "nodes": len(graph),
+        "rounds": rounds,
+        "changes_per_round": changes,
+        "initial_plan_seconds": initial_time,
+        "incremental": {"seconds": summarize(incremental_times),
+                        "mean_nodes_expanded": incremental_expanded / rounds},
+        "full_replan": {"seconds": summarize(full_times),
+                        "mean_nodes_expanded": full_expanded / rounds},
+    }
+
+
+def run_benchmarks(families, sizes, algorithms, queries=20, repeats=3, seed=0, replanning_rounds=0):
+    report = {
+        "format_version": FORMAT_VERSION,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": [],
+    }
+    for family in families:
+        for nodes in sizes:
+            print(f"Benchmarking {family} graph with {nodes} nodes...", file=sys.stderr)
+            report["results"].append(benchmark_graph(family, nodes, algorithms, queries, repeats, seed))
+            if replanning_rounds:
+                report.setdefault("replanning", []).append(
+                    benchmark_replanning(family, nodes, replanning_rounds, seed=seed))
+    return report
+
+
+def compare(report, baseline, threshold=1.10):
+    """Returns (family, nodes, algorithm, ratio) for every p50 that got slower than threshold."""
+    previous = {(result["family"], result["nodes"], algorithm): stats["seconds"]["p50"]
+                for result in baseline["results"]
+                for algorithm, stats in result["algorithms"].items()}
+    regressions = []
+    for result in report["results"]:
+        for algorithm, stats in result["algorithms"].items():
+            before = previous.get((result["family"], result["nodes"], algorithm))
+            if before:
+                ratio = stats["seconds"]["p50"] / before
+                if ratio > threshold:
+                    regressions.append((result["family"], result["nodes"], algorithm, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the route planning algorithms.")
+    parser.add_argument("--families", nargs="+", default=list(GENERATORS), choices=list(GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--algorithms", nargs="+", default=list(ALGORITHMS), choices=list(ALGORITHMS))
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="earlier JSON report to check for regressions")
+    parser.add_argument("--replanning", type=int, default=0, metavar="ROUNDS",
+                        help="also compare D* Lite against full replanning over this many update rounds")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.families, args.sizes, args.algorithms,
+                            args.queries, args.repeats, args.seed, args.replanning)
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    for result in report["results"]:
+        print(f"\n{result['family']} ({result['nodes']} nodes, {result['edges']} edges)")
+        for algorithm, stats in result["algorithms"].items():
+            seconds = stats["seconds"]
+            print(f"  {algorithm}: p50 {seconds['p50'] * 1000:.3f} ms, "
+                  f"p90 {seconds['p90'] * 1000:.3f} ms, "
+                  f"expanded {stats['mean_nodes_expanded']:.0f}, "
+                  f"peak memory {stats['peak_memory_bytes'] / 1024:.0f} KiB")
+
+    for result in report.get("replanning", []):
+        incremental, full = result["incremental"], result["full_replan"]
+        print(f"\nReplanning on {result['family']} ({result['nodes']} nodes): "
+              f"D* Lite p50 {incremental['seconds']['p50'] * 1000:.3f} ms "
+              f"({incremental['mean_nodes_expanded']:.0f} expanded) vs "
+              f"A* p50 {full['seconds']['p50'] * 1000:.3f} ms "
+              f"({full['mean_nodes_expanded']:.0f} expanded)")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        for family, nodes, algorithm, ratio in compare(report, baseline):
+            print(f"Regression: {algorithm} on {family} ({nodes} nodes) is {ratio:.2f}x slower")
+
+
+if __name__ == "__main__":
+    main()
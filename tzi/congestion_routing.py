@@ -0,0 +1,92 @@
+import os
+import sys
+
+from routeplanning import Graph, search
+
+# The congestion model lives in kieran/model.py next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "kieran"))
+from model import congestion_posterior, load_network  # noqa: E402
+
+# Travel-time multiplier for each current congestion level. None is below 1,
+# so heuristics that are admissible for the static weights stay admissible.
+CONGESTION_MULTIPLIERS = {"low": 1.0, "medium": 1.5, "high": 2.5}
+
+
+# Expected travel cost of an edge under the congestion model:
+# weight * E[multiplier | evidence]. evidence is either one
+# (weather, time_of_day, accident) tuple for every edge or a function
+# (node1, node2) -> tuple; None entries are left out of the query. Posteriors
+# are memoized per evidence tuple, so a search only runs one inference per
+# distinct combination no matter how many edges it relaxes.
+class CongestionCosts:
+    def __init__(self, evidence, inference=None, multipliers=CONGESTION_MULTIPLIERS):
+        if inference is None:
+            inference = load_network()
+        self.evidence = evidence if callable(evidence) else (lambda node1, node2: evidence)
+        self.inference = inference
+        self.multipliers = multipliers
+        self.posteriors = {}  # evidence tuple -> {state: probability}
+        self.expected = {}  # evidence tuple -> expected multiplier
+        self.inferences = 0
+
+    def posterior(self, evidence):
+        """Returns the memoized congestion posterior for an evidence tuple."""
+        posterior = self.posteriors.get(evidence)
+        if posterior is None:
+            self.inferences += 1
+            posterior = self.posteriors[evidence] = congestion_posterior(self.inference, *evidence)
+        return posterior
+
+    def multiplier(self, evidence):
+        expected = self.expected.get(evidence)
+        if expected is None:
+            expected = self.expected[evidence] = sum(
+                probability * self.multipliers[state]
+                for state, probability in self.posterior(evidence).items()
+            )
+        return expected
+
+    def __call__(self, node1, node2, weight):
+        return weight * self.multiplier(tuple(self.evidence(node1, node2)))
+
+
+def congestion_search(graph, start, goal, costs, algorithm="a_star", heuristic=None):
+    """Returns (path, cost, stats) with every edge weighted by costs."""
+    return search(graph, start, goal, algorithm, heuristic, edge_cost=costs)
+
+
+# Congestion-aware A* implementation
+def congestion_a_star(graph, start, goal, heuristic, costs):
+    return congestion_search(graph, start, goal, costs, "a_star", heuristic)[0]
+
+
+def main():
+    city_graph = Graph()
+    city_graph.add_edge("A", "B", 1)
+    city_graph.add_edge("A", "C", 4)
+    city_graph.add_edge("B", "C", 2)
+    city_graph.add_edge("B", "D", 5)
+    city_graph.add_edge("C", "D", 1)
+    city_graph.add_edge("D", "E", 3)
+
+    heuristic = {
+        "A": 7,
+        "B": 6,
+        "C": 2,
+        "D": 1,
+        "E": 0
+    }
+
+    # Rainy morning with an accident reported on B-C
+    def evidence(node1, node2):
+        accident = "yes" if {node1, node2} == {"B", "C"} else "no"
+        return ("rainy", "morning", accident)
+
+    costs = CongestionCosts(evidence)
+    path, cost, _ = congestion_search(city_graph, "A", "E", costs, "a_star", heuristic)
+    print(f"Congestion-aware A*: Path: {path}, Expected cost: {cost:.3f}")
+    print(f"Distinct inferences: {costs.inferences}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+import heapq
+import pickle
+from array import array
+
+from landmarks import Landmarks
+from routeplanning import CSRGraph
+
+FORMAT_VERSION = 1
+
+# Witness searches give up after this many settled nodes; see build()
+SETTLE_LIMIT = 500
+# Initial priorities only need rough shortcut counts, so they use much
+# cheaper searches; a node's real searches run when it reaches the queue top
+ESTIMATE_SETTLE_LIMIT = 30
+# After a contraction, neighbors with at most this many (incoming, outgoing)
+# edge pairs redo their witness searches at once
+UPDATE_PAIRS = 16
+# Edges longer than this many times the median edge are checked against
+# landmarks before contraction; graphs without any build no landmarks
+PRUNE_LONG_EDGE = 10
+# Landmarks for that check by default: one per this many nodes, within bounds
+PRUNE_NODES_PER_LANDMARK = 150
+PRUNE_MIN_LANDMARKS = 8
+PRUNE_MAX_LANDMARKS = 128
+
+
+# Packs per-node lists of (neighbor, weight) into CSR offset/target/weight arrays
+def _pack(rows):
+    offsets = array("q", [0])
+    targets = array("i")
+    weights = array("d")
+    for row in rows:
+        for neighbor, weight in row:
+            targets.append(neighbor)
+            weights.append(weight)
+        offsets.append(len(targets))
+    return offsets, targets, weights
+
+
+# Dijkstra from source in the remaining graph, skipping the node being
+# contracted, until every target (node -> cost to beat) has a witness path no
+# longer than its cost or cannot get one. Stops early after settle_limit
+# nodes, so a missed witness only costs an unnecessary shortcut, never a wrong
+# answer. Returns the targets left without a witness.
+def _witness_search(out, source, excluded, targets, settle_limit):
+    dist = {source: 0}
+    heap = [(0, source)]
+    remaining = dict(targets)
+    max_cost = max(remaining.values())
+    missing = []
+    settled = 0
+
+    while heap:
+        cost, current = heapq.heappop(heap)
+        if cost > dist[current]:
+            continue
+        if cost > max_cost or settled >= settle_limit:
+            break
+        settled += 1
+        if current in remaining:
+            if cost > remaining.pop(current):
+                missing.append(current)
+            if not remaining:
+                break
+            max_cost = max(remaining.values())
+        for neighbor, weight in out[current].items():
+            if neighbor == excluded:
+                continue
+            new_cost = cost + weight
+            # Nodes past the costliest target cannot lead to a witness
+            if new_cost <= max_cost and new_cost < dist.get(neighbor, float("inf")):
+                dist[neighbor] = new_cost
+                heapq.heappush(heap, (new_cost, neighbor))
+
+    missing += [node for node, cost in remaining.items() if dist.get(node, float("inf")) > cost]
+    return missing
+
+
+# Returns the shortcuts (u, w, cost) needed to contract node. In a symmetric
+# graph the search from u also answers for w -> u, so each pair is searched
+# once, from the end with fewer edges (hubs are expensive to search from),
+# and each shortcut is returned in both directions.
+def _shortcuts(out, in_, node, settle_limit, symmetric=False):
+    shortcuts = []
+    outgoing = out[node]
+    for u, weight_in in in_[node].items():
+        # A direct edge u -> w that is no longer is a witness on its own
+        direct = out[u]
+        targets = {
+            w: weight_in + weight_out
+            for w, weight_out in outgoing.items()
+            if ((len(out[w]), w) > (len(direct), u) if symmetric else w != u)
+            and direct.get(w, float("inf")) > weight_in + weight_out
+        }
+        if targets:
+            for w in _witness_search(out, u, node, targets, settle_limit):
+                shortcuts.append((u, w, targets[w]))
+                if symmetric:
+                    shortcuts.append((w, u, targets[w]))
+    return shortcuts
+
+
+# Removes the long edges u -> v of the remaining graph that are longer than
+# some path through a landmark, so never on a shortest path. Witness searches
+# for such edges (like long links across the map) would have to settle most
+# of the graph, and without a witness they turn into long useless shortcuts.
+# Short edges are cheap to witness, so only long ones are checked, and graphs
+# without long edges (like grids) skip the landmarks altogether.
+def _prune(graph, out, in_, count):
+    weights = sorted(weight for edges in out for weight in edges.values())
+    if not weights:
+        return
+    threshold = PRUNE_LONG_EDGE * weights[len(weights) // 2]
+    long_edges = [(u, v, weight) for u in range(len(out)) for v, weight in out[u].items() if weight > threshold]
+    if not long_edges:
+        return
+    landmarks = Landmarks.build(graph, count)
+    tables = list(zip(landmarks.to_landmark, landmarks.from_landmark))
+    for u, v, weight in long_edges:
+        if min(to[u] + from_[v] for to, from_ in tables) < weight * (1 - 1e-9):
+            del out[u][v]
+            del in_[v][u]
+
+
+# Contraction Hierarchies index: every node gets a rank, shortcuts preserve
+# shortest paths among higher-ranked nodes, and queries only ever move upwards
+# in rank from both ends
+class ContractionHierarchy:
+    def __init__(self, names, rank, up, down, shortcuts):
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self.rank = rank
+        self.up = up  # CSR arrays of edges u -> v with rank[v] > rank[u]
+        self.down = down  # CSR arrays of reversed edges u -> v with rank[u] > rank[v]
+        self.shortcuts = shortcuts  # (u, w) -> middle node of shortcut u -> w
+
+    @classmethod
+    def build(cls, graph, settle_limit=SETTLE_LIMIT, prune_landmarks=None):
+        """Preprocesses a Graph or CSRGraph into a ContractionHierarchy.
+
+        Nodes are contracted in order of priority: shortcuts added per edge
+        removed, plus the node's level and its contracted neighbors, so
+        contractions spread evenly over the graph. Neighbors get a new
+        priority after every contraction. Witness searches stop after
+        settle_limit nodes; larger limits cost more per search but add fewer
+        shortcuts, which makes later searches and the queries cheaper.
+        Before contracting, long edges that a path through one of
+        prune_landmarks landmarks beats are dropped (by default one landmark
+        per PRUNE_NODES_PER_LANDMARK nodes, within bounds; 0 turns this off).
+        """
+        if not isinstance(graph, CSRGraph):
+            graph = CSRGraph.from_graph(graph)
+        n = len(graph)
+
+        # Remaining (uncontracted) graph, keeping the lightest parallel edge
+        out = [{} for _ in range(n)]
+        in_ = [{} for _ in range(n)]
+        for u in range(n):
+            for v, weight in graph.neighbors(u):
+                if u != v and weight < out[u].get(v, float("inf")):
+                    out[u][v] = weight
+                    in_[v][u] = weight
+        if prune_landmarks is None:
+            prune_landmarks = min(PRUNE_MAX_LANDMARKS, max(PRUNE_MIN_LANDMARKS, n // PRUNE_NODES_PER_LANDMARK))
+        if prune_landmarks:
+            _prune(graph, out, in_, prune_landmarks)
+        symmetric = out == in_
+
+        deleted = [0] * n  # Contracted neighbors
+        level = [0] * n  # Longest chain of contracted nodes below
+        added = [0] * n  # Shortcuts the latest witness searches asked for
+        pending = [None] * n  # Those shortcuts, None until searched or once edges changed since
+        priorities = [0] * n
+
+        def priority(node):
+            removed = len(out[node]) + len(in_[node])
+            return 1000 * added[node] // max(1, removed) + 10 * level[node] + 10 * deleted[node]
+
+        def evaluate(node):
+            pending[node] = _shortcuts(out, in_, node, settle_limit, symmetric)
+            added[node] = len(pending[node])
+            priorities[node] = priority(node)
+
+        for node in range(n):
+            added[node] = len(_shortcuts(out, in_, node, ESTIMATE_SETTLE_LIMIT, symmetric))
+            priorities[node] = priority(node)
+        heap = [(priorities[node], node) for node in range(n)]
+        heapq.heapify(heap)
+        rank = array("q", bytes(8 * n))
+        contracted_nodes = bytearray(n)
+        up_rows, down_rows = [None] * n, [None] * n
+        shortcuts = {}
+        contracted = 0
+
+        while heap:
+            old_priority, node = heapq.heappop(heap)
+            if contracted_nodes[node] or old_priority != priorities[node]:
+                continue  # Contracted, or queued again with a newer priority
+
+            if pending[node] is None:
+                # Lazy update: run the witness searches and re-queue the node
+                # if it got less attractive than the next one
+                evaluate(node)
+                if heap and priorities[node] > heap[0][0]:
+                    heapq.heappush(heap, (priorities[node], node))
+                    continue
+
+            rank[node] = contracted
+            contracted += 1
+            contracted_nodes[node] = 1
+            up_rows[node] = list(out[node].items())
+            down_rows[node] = list(in_[node].items())
+
+            for u, w, cost in pending[node]:
+                if cost < out[u].get(w, float("inf")):
+                    out[u][w] = cost
+                    in_[w][u] = cost
+                    shortcuts[(u, w)] = node
+            pending[node] = None
+
+            neighbors = set(in_[node]).union(out[node])
+            for u in in_[node]:
+                del out[u][node]
+            for w in out[node]:
+                del in_[w][node]
+            out[node], in_[node] = {}, {}
+
+            # Re-prioritize the neighbors right away. Their witness searches
+            # are redone now when they have few edges, and otherwise (hubs,
+            # whose searches are expensive and whose neighbors keep getting
+            # contracted) only when they reach the top of the queue
+            for neighbor in neighbors:
+                deleted[neighbor] += 1
+                level[neighbor] = max(level[neighbor], level[node] + 1)
+                if len(in_[neighbor]) * len(out[neighbor]) <= UPDATE_PAIRS:
+                    evaluate(neighbor)
+                else:
+                    pending[neighbor] = None
+                    priorities[neighbor] = priority(neighbor)
+                heapq.heappush(heap, (priorities[neighbor], neighbor))
+
+        # Only keep middles of shortcuts that made it into the hierarchy
+        kept = {}
+        for u in range(n):
+            for v, _ in up_rows[u]:
+                if (u, v) in shortcuts:
+                    kept[(u, v)] = shortcuts[(u, v)]
+            for v, _ in down_rows[u]:
+                if (v, u) in shortcuts:
+                    kept[(v, u)] = shortcuts[(v, u)]
+
+        return cls(graph.names, rank, _pack(up_rows), _pack(down_rows), kept)
+
+    def save(self, path):
+        """Writes the index to disk."""
+        sources, targets, middles = array("q"), array("q"), array("q")
+        for (u, w), middle in self.shortcuts.items():
+            sources.append(u)
+            targets.append(w)
+            middles.append(middle)
+        with open(path, "wb") as file:
+            pickle.dump({
+                "version": FORMAT_VERSION,
+                "names": self.names,
+                "rank": self.rank,
+                "up": self.up,
+                "down": self.down,
+                "shortcuts": (sources, targets, middles),
+            }, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """Reads an index written by save()."""
+        with open(path, "rb") as file:
+            data = pickle.load(file)
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported contraction hierarchy format in {path}")
+        sources, targets, middles = data["shortcuts"]
+        shortcuts = {(u, w): middle for u, w, middle in zip(sources, targets, middles)}
+        return cls(data["names"], data["rank"], data["up"], data["down"], shortcuts)
+
+    def _unpack(self, u, w, path):
+        # Appends the original nodes of edge u -> w (excluding u) to path
+        stack = [(u, w)]
+        while stack:
+            a, b = stack.pop()
+            middle = self.shortcuts.get((a, b))
+            if middle is None:
+                path.append(b)
+            else:
+                stack.append((middle, b))
+                stack.append((a, middle))
+
+    def query(self, start, goal):
+        """Returns (path, cost, stats) for the shortest route from start to goal."""
+        start, goal = self.index[start], self.index[goal]
+        # Each side searches its own edges and stalls on the other side's
+        sides = [
+            (self.up, self.down, {start: 0}, {start: None}, [(0, start)]),
+            (self.down, self.up, {goal: 0}, {goal: None}, [(0, goal)]),
+        ]
+        best_cost, meeting = float("inf"), None
+        expanded = relaxed = 0
+        peak = 2
+
+        while sides[0][4] or sides[1][4]:
+            # Advance the side with the smaller key; a side is done once its
+            # smallest key cannot beat the best meeting cost
+            live = [i for i in (0, 1) if sides[i][4] and sides[i][4][0][0] < best_cost]
+            if not live:
+                break
+            i = min(live, key=lambda i: sides[i][4][0][0])
+            (offsets, targets, weights), (stall_offsets, stall_targets, stall_weights), dist, parent, frontier = sides[i]
+            other_dist = sides[1 - i][2]
+
+            cost, current = heapq.heappop(frontier)
+            if cost > dist[current]:
+                continue
+            expanded += 1
+            if current in other_dist and cost + other_dist[current] < best_cost:
+                best_cost, meeting = cost + other_dist[current], current
+
+            # Stall-on-demand: a higher node already reached reaches current
+            # more cheaply, so current is not on a shortest upward path and
+            # its edges need not be relaxed
+            if any(dist.get(stall_targets[position], float("inf")) + stall_weights[position] < cost
+                   for position in range(stall_offsets[current], stall_offsets[current + 1])):
+                continue
+
+            for position in range(offsets[current], offsets[current + 1]):
+                relaxed += 1
+                neighbor = targets[position]
+                new_cost = cost + weights[position]
+                if new_cost < dist.get(neighbor, float("inf")):
+                    dist[neighbor] = new_cost
+                    parent[neighbor] = current
+                    heapq.heappush(frontier, (new_cost, neighbor))
+            peak = max(peak, len(sides[0][4]) + len(sides[1][4]))
+
+        stats = {"nodes_expanded": expanded, "peak_frontier": peak, "edges_relaxed": relaxed}
+        if meeting is None:
+            return None, None, stats
+
+        # Upward half from start, then the downward half back out to goal,
+        # expanding shortcuts into their original edges
+        forward_parent, backward_parent = sides[0][3], sides[1][3]
+        chain = [meeting]
+        while forward_parent[chain[-1]] is not None:
+            chain.append(forward_parent[chain[-1]])
+        chain.reverse()
+        node = meeting
+        while backward_parent[node] is not None:
+            node = backward_parent[node]
+            chain.append(node)
+
+        path = [chain[0]]
+        for u, w in zip(chain, chain[1:]):
+            self._unpack(u, w, path)
+        return [self.names[node] for node in path], best_cost, stats
+
+    def route(self, start, goal):
+        """Returns only the path, like the search functions in routeplanning."""
+        return self.query(start, goal)[0]
@@ -0,0 +1,162 @@
+import csv
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+
+from routeplanning import CSRGraph
+
+# Binary graph file layout (little-endian, every section 8-byte aligned):
+#   header       MAGIC, version, flags, node count, edge count and the byte
+#                offset of each section below
+#   name index   uint64[nodes + 1] offsets into the name blob
+#   name blob    UTF-8 node names, in id (= sorted name) order
+#   offsets      uint64[nodes + 1] CSR row offsets
+#   targets      uint32[edges] CSR targets
+#   weights      float64[edges] CSR weights
+MAGIC = b"RPGRAPH\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQQQQQQ")
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+def save_graph(graph, path):
+    """Writes a CSRGraph with string node names to path."""
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_graph(graph)
+    if not all(isinstance(name, str) for name in graph.names):
+        raise TypeError("graph files only store string node names")
+
+    names = [name.encode("utf-8") for name in graph.names]
+    name_offsets = array("Q", [0])
+    for name in names:
+        name_offsets.append(name_offsets[-1] + len(name))
+    sections = [
+        name_offsets.tobytes(),
+        b"".join(names),
+        array("Q", graph.offsets).tobytes(),
+        array("I", graph.targets).tobytes(),
+        array("d", graph.weights).tobytes(),
+    ]
+
+    positions = []
+    position = _align(HEADER.size)
+    for section in sections:
+        positions.append(position)
+        position = _align(position + len(section))
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, len(graph), graph.num_edges(), *positions))
+        for start, section in zip(positions, sections):
+            file.write(b"\0" * (start - file.tell()))
+            file.write(section)
+
+
+# Node names read straight from the mapped file, decoded on access
+class _NameTable(Sequence):
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+# Name -> id lookup by binary search: ids are assigned in sorted name order,
+# so no dict has to be built at load time
+class _NameIndex(Mapping):
+    def __init__(self, names):
+        self.names = names
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __getitem__(self, name):
+        low, high = 0, len(self.names)
+        while low < high:
+            middle = (low + high) // 2
+            if self.names[middle] < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.names) and self.names[low] == name:
+            return low
+        raise KeyError(name)
+
+
+# CSRGraph backed by a memory-mapped graph file. Worker processes that load
+# the same file share its pages, and pickling only sends the path.
+class MappedGraph(CSRGraph):
+    def __init__(self, path, writable=False):
+        self.path = path
+        self.writable = writable
+        with open(path, "rb") as file:
+            # ACCESS_COPY lets update_weight() work on private pages
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY if writable else mmap.ACCESS_READ)
+        view = memoryview(self._map)
+
+        magic, version, _, nodes, edges, *positions = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} graph file")
+        names_at, blob_at, offsets_at, targets_at, weights_at = positions
+
+        name_offsets = view[names_at:names_at + 8 * (nodes + 1)].cast("Q")
+        blob = view[blob_at:blob_at + name_offsets[nodes]]
+        names = _NameTable(name_offsets, blob)
+        super().__init__(
+            names,
+            view[offsets_at:offsets_at + 8 * (nodes + 1)].cast("Q"),
+            view[targets_at:targets_at + 4 * edges].cast("I"),
+            view[weights_at:weights_at + 8 * edges].cast("d"),
+            _NameIndex(names),
+        )
+
+    def __reduce__(self):
+        return MappedGraph, (self.path, self.writable)
+
+
+def load_graph(path, writable=False):
+    """Memory-maps a graph file written by save_graph()."""
+    return MappedGraph(path, writable)
+
+
+def csv_to_graph_file(csv_path, path, directed=False, delimiter=","):
+    """Converts an edge-list CSV (source, target, weight per row) to a graph file.
+    A first row whose weight is not a number is treated as a header."""
+    def edges():
+        with open(csv_path, newline="") as file:
+            for number, row in enumerate(csv.reader(file, delimiter=delimiter)):
+                if not row:
+                    continue
+                try:
+                    weight = float(row[2])
+                except ValueError:
+                    if number == 0:
+                        continue
+                    raise ValueError(f"{csv_path}:{number + 1}: bad weight {row[2]!r}")
+                yield row[0], row[1], weight
+
+    graph = CSRGraph.from_edges(edges(), directed=directed)
+    save_graph(graph, path)
+    return graph
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python graphfile.py EDGES.csv GRAPH.bin")
+    graph = csv_to_graph_file(sys.argv[1], sys.argv[2])
+    print(f"Wrote {len(graph)} nodes and {graph.num_edges()} edges to {sys.argv[2]}")
@@ -0,0 +1,170 @@
+import heapq
+
+from routeplanning import CSRGraph
+
+INF = float("inf")
+TOLERANCE = 1e-9
+
+
+# D* Lite (Koenig & Likhachev): an incremental A* that searches backwards from
+# the goal and keeps its g/rhs values between calls. After edge weights change
+# or the vehicle moves on, plan() only re-expands the nodes whose distance to
+# the goal was affected instead of starting over.
+class DStarLite:
+    def __init__(self, graph, start, goal, heuristic=None):
+        """heuristic(a, b) must be a consistent lower bound on the distance
+        from node a to node b, e.g. landmarks.Landmarks.bound; defaults to 0.
+        A Landmarks object built for the same CSRGraph may be passed instead,
+        whose bounds are then read straight from node ids."""
+        self.graph = graph
+        if isinstance(graph, CSRGraph):
+            self.successors = graph.neighbors
+            self.predecessors = graph.reverse().neighbors  # Kept in step by update_weight
+            self.encode, self.decode = graph.index.__getitem__, graph.names.__getitem__
+        else:
+            self.successors = self.predecessors = graph.graph.__getitem__
+            self.encode = self.decode = lambda node: node
+        self.heuristic = heuristic
+        self.start, self.goal = self.encode(start), self.encode(goal)
+        self.km = 0
+        self.moves = 0  # move_to() calls so far; keys pushed before the latest one may be outdated
+        self.g = {}
+        self.rhs = {self.goal: 0}
+        self.open = {}  # node -> key of its live heap entry
+        self.frontier = []  # (key, node, moves when pushed)
+        self.changed = set()
+        self.nodes_expanded = 0
+        self.h_cache = {}
+        self.bound = self._bound_from(self.start)
+        self._push(self.goal)
+
+    def _bound_from(self, start):
+        # Lower bound from start to a node id, or None without a heuristic
+        if self.heuristic is None:
+            return None
+        if getattr(self.heuristic, "graph", None) is self.graph and hasattr(self.heuristic, "heuristic_from"):
+            return self.heuristic.heuristic_from(self.decode(start)).estimate
+        heuristic, decode, start = self.heuristic, self.decode, self.decode(start)
+        return lambda node: heuristic(start, decode(node))
+
+    def _h(self, node):
+        if self.bound is None:
+            return 0
+        # Bounds are cached per start; move_to() clears them
+        h = self.h_cache.get(node)
+        if h is None:
+            h = self.h_cache[node] = self.bound(node)
+        return h
+
+    def _key(self, node):
+        best = min(self.g.get(node, INF), self.rhs.get(node, INF))
+        return (best + self._h(node) + self.km, best)
+
+    def _push(self, node):
+        key = self._key(node)
+        self.open[node] = key
+        heapq.heappush(self.frontier, (key, node, self.moves))
+
+    def _update_vertex(self, node):
+        if node != self.goal:
+            g = self.g
+            self.rhs[node] = min((weight + g.get(successor, INF)
+                                  for successor, weight in self.successors(node)), default=INF)
+        self._queue(node)
+
+    def _queue(self, node):
+        # Queues an inconsistent node and drops a consistent one
+        if self.g.get(node, INF) != self.rhs.get(node, INF):
+            self._push(node)
+        else:
+            self.open.pop(node, None)
+
+    def _compute_shortest_path(self):
+        expanded = 0
+        frontier, open_, g, rhs = self.frontier, self.open, self.g, self.rhs
+        start, goal, moves = self.start, self.goal, self.moves
+        predecessors, update_vertex, queue = self.predecessors, self._update_vertex, self._queue
+        # The start's bound and km are fixed while this runs, so its key
+        # only moves with its own g/rhs values
+        start_h = self._h(start) + self.km
+        while frontier:
+            key, node, pushed = frontier[0]
+            if open_.get(node) != key:
+                heapq.heappop(frontier)  # Stale entry
+                continue
+            # Keys that tie with the start's up to rounding (h and km are sums
+            # of floats) are still processed, or the path walk below can loop
+            start_g, start_rhs = g.get(start, INF), rhs.get(start, INF)
+            start_key = min(start_g, start_rhs) + start_h
+            if key[0] > start_key + TOLERANCE * max(1, abs(start_key)) and start_g == start_rhs:
+                break
+
+            heapq.heappop(frontier)
+            del open_[node]
+            if pushed != moves:
+                # Pushed before the start moved: the key may have grown since
+                new_key = self._key(node)
+                if key < new_key:
+                    open_[node] = new_key
+                    heapq.heappush(frontier, (new_key, node, moves))
+                    continue
+
+            expanded += 1
+            old_g = g.get(node, INF)
+            if old_g > rhs.get(node, INF):
+                # g drops to rhs, which can only lower the predecessors' rhs
+                new_g = g[node] = rhs[node]
+                for predecessor, weight in predecessors(node):
+                    cost = weight + new_g
+                    if cost < rhs.get(predecessor, INF) and predecessor != goal:
+                        rhs[predecessor] = cost
+                        queue(predecessor)
+            else:
+                # g rises: only the predecessors whose rhs came through node
+                # need it recomputed
+                g[node] = INF
+                queue(node)
+                for predecessor, weight in predecessors(node):
+                    if rhs.get(predecessor) == weight + old_g:
+                        update_vertex(predecessor)
+        return expanded
+
+    def update_edge(self, node1, node2, weight):
+        """Changes an edge weight on the graph and marks it for repair."""
+        self.graph.update_weight(node1, node2, weight)
+        self.edge_changed(node1, node2)
+
+    def edge_changed(self, node1, node2):
+        """Marks an edge whose weight was already changed on the graph."""
+        self.changed.add(self.encode(node1))
+        self.changed.add(self.encode(node2))
+
+    def move_to(self, node):
+        """Moves the start, e.g. once the vehicle has driven part of the route."""
+        node = self.encode(node)
+        if self.bound is not None:
+            self.km += self.bound(node)
+        self.start = node
+        self.moves += 1
+        self.h_cache.clear()
+        self.bound = self._bound_from(node)
+
+    def plan(self):
+        """Returns (path, cost) from the current start, repairing only what changed."""
+        for node in self.changed:
+            self._update_vertex(node)
+        self.changed.clear()
+        self.nodes_expanded = self._compute_shortest_path()
+
+        cost = self.g.get(self.start, INF)
+        if cost == INF:
+            return None, None
+
+        # Follow the cheapest successor down to the goal
+        path = [self.start]
+        node = self.start
+        while node != self.goal:
+            node = min(self.successors(node),
+                       key=lambda edge: edge[1] + self.g.get(edge[0], INF))[0]
+            path.append(node)
+        return [self.decode(node) for node in path], cost
@@ -0,0 +1,180 @@
+import heapq
+import random
+import sys
+from array import array
+
+from routeplanning import CSRGraph
+
+INF = float("inf")
+
+
+# One-to-all Dijkstra over a CSRGraph; returns (distances, parents) as arrays
+# indexed by node id, with INF / -1 for unreachable nodes
+def _shortest_path_tree(graph, source):
+    n = len(graph)
+    dist = array("d", [INF]) * n
+    parent = array("q", [-1]) * n
+    dist[source] = 0
+    heap = [(0, source)]
+
+    while heap:
+        cost, current = heapq.heappop(heap)
+        if cost > dist[current]:
+            continue
+        for neighbor, weight in graph.neighbors(current):
+            new_cost = cost + weight
+            if new_cost < dist[neighbor]:
+                dist[neighbor] = new_cost
+                parent[neighbor] = current
+                heapq.heappush(heap, (new_cost, neighbor))
+
+    return dist, parent
+
+
+# Triangle-inequality lower bound on the distance to (or from) one fixed node,
+# usable anywhere the search functions expect a heuristic dict
+class LandmarkHeuristic:
+    def __init__(self, names, index, plus, minus):
+        self.names = names
+        self.index = index
+        self.plus = plus  # (table, constant) pairs giving table[v] - constant
+        self.minus = minus  # (table, constant) pairs giving constant - table[v]
+
+    def __getitem__(self, name):
+        return self.estimate(self.index[name])
+
+    def __sizeof__(self):
+        # The distance tables, names and index are shared with the Landmarks
+        # object and the graph; only the per-goal lists belong to this one
+        pairs = self.plus + self.minus
+        return object.__sizeof__(self) + sys.getsizeof(self.plus) + sys.getsizeof(self.minus) + \
+            sum(map(sys.getsizeof, pairs)) + sum(sys.getsizeof(constant) for _, constant in pairs)
+
+    def estimate(self, node):
+        """Returns the lower bound for a node id."""
+        best = 0
+        for table, constant in self.plus:
+            bound = table[node] - constant
+            if bound > best:
+                best = bound
+        for table, constant in self.minus:
+            bound = constant - table[node]
+            if bound > best:
+                best = bound
+        return best
+
+
+# ALT preprocessing: exact distances to and from a few landmarks, from which
+# admissible and consistent heuristics for any goal follow by the triangle
+# inequality
+class Landmarks:
+    def __init__(self, graph, landmarks, from_landmark, to_landmark):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.from_landmark = from_landmark  # from_landmark[i][v] = d(landmark i, v)
+        self.to_landmark = to_landmark  # to_landmark[i][v] = d(v, landmark i)
+
+    @classmethod
+    def build(cls, graph, count=8, method="farthest", seed=0):
+        """Selects landmarks ("farthest" or "avoid") and computes their distance tables."""
+        if method not in ("farthest", "avoid"):
+            raise ValueError(f"unknown landmark selection method {method!r}")
+        if not isinstance(graph, CSRGraph):
+            graph = CSRGraph.from_graph(graph)
+        reverse = graph.reverse()
+        rng = random.Random(seed)
+        landmarks = cls(graph, [], [], [])
+        chosen = set()
+        nearest = None  # nearest[v] = distance to v from the closest landmark so far
+
+        for _ in range(min(count, len(graph))):
+            if method == "farthest":
+                landmark = landmarks._farthest(rng, nearest, chosen)
+            else:
+                landmark = landmarks._avoid(rng, nearest, chosen)
+            if landmark is None:
+                break
+            table = _shortest_path_tree(graph, landmark)[0]
+            landmarks.landmarks.append(landmark)
+            landmarks.from_landmark.append(table)
+            landmarks.to_landmark.append(_shortest_path_tree(reverse, landmark)[0])
+            chosen.add(landmark)
+            nearest = table if nearest is None else array("d", map(min, nearest, table))
+
+        return landmarks
+
+    def _farthest(self, rng, nearest, chosen):
+        # Node farthest from the closest chosen landmark (from a random node
+        # for the first pick), preferring nodes that are reachable at all
+        if nearest is None:
+            nearest = _shortest_path_tree(self.graph, rng.randrange(len(self.graph)))[0]
+        best, best_distance = None, -1
+        for node, distance in enumerate(nearest):
+            if distance == INF:
+                distance = -0.5  # Unreachable: only picked if nothing else is left
+            if distance > best_distance and node not in chosen:
+                best, best_distance = node, distance
+        return best
+
+    def _avoid(self, rng, nearest, chosen):
+        # Goldberg & Werneck "avoid": grow a shortest path tree from a random
+        # root, weight each node by how badly the current landmarks bound its
+        # distance, and walk down to the leaf of the heaviest landmark-free
+        # subtree
+        root = rng.randrange(len(self.graph))
+        dist, parent = _shortest_path_tree(self.graph, root)
+        bound = self.heuristic_from(self.graph.names[root]) if self.landmarks else None
+
+        children = {}
+        for node in range(len(self.graph)):
+            if parent[node] >= 0:
+                children.setdefault(parent[node], []).append(node)
+        order = [root]  # Parents before children
+        for node in order:
+            order.extend(children.get(node, []))
+
+        size = {}
+        covered = set()
+        for node in reversed(order):
+            if node in chosen or any(child in covered for child in children.get(node, [])):
+                covered.add(node)
+                size[node] = 0
+            else:
+                weight = dist[node] - (bound.estimate(node) if bound else 0)
+                size[node] = weight + sum(size[child] for child in children.get(node, []))
+
+        node = root
+        while children.get(node):
+            child = max(children[node], key=size.__getitem__)
+            if size[child] <= 0:
+                break
+            node = child
+        if node in chosen or size[node] <= 0:
+            return self._farthest(rng, nearest, chosen)
+        return node
+
+    def bound(self, a, b):
+        """Returns a lower bound on the distance from node a to node b."""
+        a, b = self.graph.index[a], self.graph.index[b]
+        best = 0
+        for table in self.to_landmark:
+            if table[b] < INF and table[a] - table[b] > best:
+                best = table[a] - table[b]
+        for table in self.from_landmark:
+            if table[a] < INF and table[b] - table[a] > best:
+                best = table[b] - table[a]
+        return best
+
+    def heuristic(self, goal):
+        """Returns a lower bound on the distance from each node to goal."""
+        goal = self.graph.index[goal]
+        plus = [(table, table[goal]) for table in self.to_landmark if table[goal] < INF]
+        minus = [(table, table[goal]) for table in self.from_landmark if table[goal] < INF]
+        return LandmarkHeuristic(self.graph.names, self.graph.index, plus, minus)
+
+    def heuristic_from(self, start):
+        """Returns a lower bound on the distance from start to each node."""
+        start = self.graph.index[start]
+        plus = [(table, table[start]) for table in self.from_landmark if table[start] < INF]
+        minus = [(table, table[start]) for table in self.to_landmark if table[start] < INF]
+        return LandmarkHeuristic(self.graph.names, self.graph.index, plus, minus)
@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import bisect
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmark import GENERATORS
+from landmarks import Landmarks
+from routeplanning import search
+
+
+class ServiceOverloaded(Exception):
+    """Raised when a request arrives while the service is already at max_pending
+    and admission is "reject"."""
+
+
+# Fixed-bucket latency histogram; bucket bounds grow geometrically from 0.1 ms
+class LatencyHistogram:
+    BOUNDS = [0.0001 * 1.5 ** i for i in range(40)]  # Seconds, up to ~1.1 hours
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, fraction):
+        """Returns the upper bound of the bucket holding the given percentile."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.BOUNDS[bucket] if bucket < len(self.BOUNDS) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+        }
+
+
+# Worker processes keep the graph and the heuristics from the pool
+# initializer, so requests only carry names. Tasks sent to an executor the
+# caller supplied carry the graph and heuristics themselves instead. Graph and heuristics travel in
+# one pickle, so a heuristic built for the graph (like
+# landmarks.LandmarkHeuristic) still shares its names and keeps its fast path.
+_worker_graph = None
+_worker_heuristics = {}
+
+
+def _init_worker(graph, heuristics=None):
+    global _worker_graph, _worker_heuristics
+    _worker_graph = graph
+    _worker_heuristics = heuristics or {}
+
+
+def _run_search(start, goal, algorithm, heuristic_name, graph=None, heuristics=None):
+    if graph is None:
+        graph, heuristics = _worker_graph, _worker_heuristics
+    heuristic = None
+    if heuristic_name is not None:
+        heuristic = heuristics[heuristic_name]
+        if callable(heuristic):
+            # A factory such as Landmarks.heuristic: build the goal's heuristic here
+            heuristic = heuristic(goal)
+    path, cost, _ = search(graph, start, goal, algorithm, heuristic)
+    return path, cost
+
+
+# Asyncio front-end for the route planners. Searches run in a process pool;
+# identical (start, goal, algorithm, heuristic) requests in flight share one
+# search; at most max_pending searches run at a time, and latencies are kept
+# per algorithm. heuristics maps names to heuristics (or to factories called
+# with the goal, like Landmarks.heuristic) installed once in every worker;
+# requests refer to them by name. With admission="reject" a request that
+# needs a new search while max_pending are running fails with
+# ServiceOverloaded; with admission="wait" it waits for a free slot.
+# An executor passed in never ran _init_worker, so every task sends it the
+# graph and heuristics: cheap for a ThreadPoolExecutor, but a process pool
+# would pickle the graph per request.
+class RouteService:
+    def __init__(self, graph, workers=None, max_pending=1000, executor=None, heuristics=None, admission="reject"):
+        if admission not in ("reject", "wait"):
+            raise ValueError(f"unknown admission mode {admission!r}")
+        self.graph = graph
+        self.heuristics = dict(heuristics or {})
+        self.max_pending = max_pending
+        self.admission = admission
+        if executor is None:
+            executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(graph, self.heuristics))
+            self.task_args = ()
+        else:
+            self.task_args = (graph, self.heuristics)
+        self.executor = executor
+        self.slots = asyncio.Semaphore(max_pending)
+        self.in_flight = {}  # (start, goal, algorithm, heuristic name) -> future
+        self.pending = 0
+        self.histograms = {}
+        self.requests = self.coalesced = self.rejected = self.waited = 0
+
+    async def route(self, start, goal, algorithm="a_star", heuristic=None):
+        """Returns (path, cost). heuristic is the name of one of the service's heuristics.
+        Concurrent duplicates share the first request's search."""
+        if heuristic is not None and not (isinstance(heuristic, str) and heuristic in self.heuristics):
+            raise ValueError(f"heuristic must name one of {sorted(self.heuristics)}, got {heuristic!r}")
+        self.requests += 1
+        start_time = time.perf_counter()
+        key = (start, goal, algorithm, heuristic)
+
+        future = self.in_flight.get(key)
+        if future is None and self.pending >= self.max_pending:
+            if self.admission == "reject":
+                self.rejected += 1
+                raise ServiceOverloaded(f"{self.pending} requests already pending")
+            self.waited += 1
+        if future is None:
+            await self.slots.acquire()
+            # Another request may have started the same search while this one waited
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.slots.release()
+        if future is not None:
+            self.coalesced += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, _run_search, start, goal, algorithm, heuristic,
+                                          *self.task_args)
+            self.in_flight[key] = future
+            self.pending += 1
+            future.add_done_callback(lambda _: self._finished(key))
+
+        try:
+            # shield: one caller being cancelled must not cancel the others
+            return await asyncio.shield(future)
+        finally:
+            self.histograms.setdefault(algorithm, LatencyHistogram()).record(time.perf_counter() - start_time)
+
+    def _finished(self, key):
+        del self.in_flight[key]
+        self.pending -= 1
+        self.slots.release()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "waited": self.waited,
+            "pending": self.pending,
+            "latency": {algorithm: histogram.snapshot() for algorithm, histogram in self.histograms.items()},
+        }
+
+    def close(self):
+        self.executor.shutdown()
+
+
+async def generate_load(service, pairs, requests, concurrency, algorithm="a_star", seed=0, heuristic=None):
+    """Closed-loop load generator: concurrency clients sending requests drawn from pairs.
+    Returns the number of requests rejected as overloaded."""
+    rng = random.Random(seed)
+    queries = [rng.choice(pairs) for _ in range(requests)]
+    rejected = 0
+
+    async def client(queries):
+        nonlocal rejected
+        for start, goal in queries:
+            try:
+                await service.route(start, goal, algorithm, heuristic)
+            except ServiceOverloaded:
+                rejected += 1
+
+    await asyncio.gather(*(client(queries[i::concurrency]) for i in range(concurrency)))
+    return rejected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local load test against RouteService.")
+    parser.add_argument("--family", default="grid", choices=list(GENERATORS))
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--distinct", type=int, default=50, help="number of distinct start/goal pairs")
+    parser.add_argument("--algorithm", default="bidirectional_dijkstra")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-pending", type=int, default=1000)
+    parser.add_argument("--admission", choices=["reject", "wait"], default="reject",
+                        help="what a request does when max-pending searches are running")
+    parser.add_argument("--landmarks", type=int, default=0,
+                        help="install an ALT heuristic with this many landmarks in the workers")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    graph, _ = GENERATORS[args.family](args.nodes, args.seed)
+    rng = random.Random(args.seed)
+    pairs = [tuple(rng.sample(graph.names, 2)) for _ in range(args.distinct)]
+
+    heuristics, heuristic = {}, None
+    if args.landmarks:
+        heuristics["landmarks"] = Landmarks.build(graph, args.landmarks, seed=args.seed).heuristic
+        heuristic = "landmarks"
+    service = RouteService(graph, args.workers, args.max_pending, heuristics=heuristics, admission=args.admission)
+    start_time = time.perf_counter()
+    try:
+        asyncio.run(generate_load(service, pairs, args.requests, args.concurrency, args.algorithm, args.seed,
+                                  heuristic))
+    finally:
+        service.close()
+    elapsed = time.perf_counter() - start_time
+
+    stats = service.stats()
+    print(f"{stats['requests']} requests in {elapsed:.2f} s ({stats['requests'] / elapsed:.0f} req/s), "
+          f"{stats['coalesced']} coalesced, {stats['rejected']} rejected, {stats['waited']} waited")
+    for algorithm, latency in stats["latency"].items():
+        print(f"  {algorithm}: p50 <= {latency['p50'] * 1000:.1f} ms, "
+              f"p90 <= {latency['p90'] * 1000:.1f} ms, p99 <= {latency['p99'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 import heapq
-from collections import deque
+import os
+import sys
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 import time
 
 # Graph representation
 class Graph:
     def __init__(self):
         self.graph = {}
+        self.version = 0  # Bumped on every change, see RouteCache
 
     def add_edge(self, node1, node2, weight):
         if node1 not in self.graph:
@@ -14,86 +19,659 @@ class Graph:
             self.graph[node2] = []
         self.graph[node1].append((node2, weight))
         self.graph[node2].append((node1, weight))  # Assuming undirected graph
+        self.version += 1
+
+    def update_weight(self, node1, node2, weight):
+        found = False
+        for a, b in ((node1, node2), (node2, node1)):
+            edges = self.graph.get(a, [])
+            for i, (neighbor, _) in enumerate(edges):
+                if neighbor == b:
+                    edges[i] = (neighbor, weight)
+                    found = True
+        if not found:
+            raise KeyError(f"no edge between {node1} and {node2}")
+        self.version += 1
+
+# Compact graph representation: node names interned to integer ids and
+# edges stored in CSR (compressed sparse row) offset/target/weight arrays
+class CSRGraph:
+    def __init__(self, names, offsets, targets, weights, index=None):
+        self.names = names
+        # Any mapping from name to id works, e.g. graphfile's on-disk lookup
+        self.index = {name: i for i, name in enumerate(names)} if index is None else index
+        self.offsets = offsets  # Row i spans targets[offsets[i]:offsets[i + 1]]
+        self.targets = targets
+        self.weights = weights
+        self.version = 0  # Bumped on every change, see RouteCache
+        self._reverse = None
+
+    @classmethod
+    def from_edges(cls, edges, directed=False):
+        """Builds a CSRGraph from an iterable of (node1, node2, weight)."""
+        names, index = [], {}
+        sources, targets, weights = array("q"), array("q"), array("d")
+        for node1, node2, weight in edges:
+            for node in (node1, node2):
+                if node not in index:
+                    index[node] = len(names)
+                    names.append(node)
+            sources.append(index[node1])
+            targets.append(index[node2])
+            weights.append(weight)
+            if not directed:
+                sources.append(index[node2])
+                targets.append(index[node1])
+                weights.append(weight)
+
+        # Renumber nodes in sorted name order so that comparing ids gives the
+        # same ordering (and the same tie-breaks) as comparing names
+        order = sorted(range(len(names)), key=names.__getitem__)
+        rank = array("q", bytes(8 * len(names)))
+        for new_id, old_id in enumerate(order):
+            rank[old_id] = new_id
+
+        # Counting sort by source; stable, so each row keeps insertion order
+        offsets = array("q", bytes(8 * (len(names) + 1)))
+        for source in sources:
+            offsets[rank[source] + 1] += 1
+        for i in range(len(names)):
+            offsets[i + 1] += offsets[i]
+        fill = offsets[:-1]
+        row_targets = array("i", bytes(4 * len(targets)))
+        row_weights = array("d", bytes(8 * len(weights)))
+        for source, target, weight in zip(sources, targets, weights):
+            row = rank[source]
+            position = fill[row]
+            row_targets[position] = rank[target]
+            row_weights[position] = weight
+            fill[row] = position + 1
+
+        return cls([names[i] for i in order], offsets, row_targets, row_weights)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Converts a dict-of-lists Graph into a CSRGraph."""
+        return cls.from_edges(
+            ((node, neighbor, weight)
+             for node, neighbors in graph.graph.items()
+             for neighbor, weight in neighbors),
+            directed=True
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def num_edges(self):
+        return len(self.targets)
+
+    def neighbors(self, node_id):
+        """Returns (neighbor_id, weight) pairs for a node id."""
+        start, end = self.offsets[node_id], self.offsets[node_id + 1]
+        return zip(self.targets[start:end], self.weights[start:end])
+
+    def update_weight(self, node1, node2, weight, directed=False):
+        """Sets the weight of edge node1 -> node2 (and node2 -> node1 unless directed)."""
+        pairs = [(node1, node2)] if directed else [(node1, node2), (node2, node1)]
+        found = False
+        for a, b in pairs:
+            a, b = self.index[a], self.index[b]
+            if self._update_row(a, b, weight):
+                found = True
+                # Keep a cached reverse graph in step instead of rebuilding it
+                if self._reverse is not None:
+                    self._reverse._update_row(b, a, weight)
+                    self._reverse.version += 1
+        if not found:
+            raise KeyError(f"no edge between {node1} and {node2}")
+        self.version += 1
+
+    def _update_row(self, node, neighbor, weight):
+        found = False
+        for position in range(self.offsets[node], self.offsets[node + 1]):
+            if self.targets[position] == neighbor:
+                self.weights[position] = weight
+                found = True
+        return found
+
+    def reverse(self):
+        """Returns the CSRGraph with every edge reversed, using the same ids."""
+        if self._reverse is None:
+            n = len(self.names)
+            offsets = array("q", bytes(8 * (n + 1)))
+            for target in self.targets:
+                offsets[target + 1] += 1
+            for i in range(n):
+                offsets[i + 1] += offsets[i]
+            fill = offsets[:-1]
+            targets = array("i", bytes(4 * len(self.targets)))
+            weights = array("d", bytes(8 * len(self.weights)))
+            for source in range(n):
+                for position in range(self.offsets[source], self.offsets[source + 1]):
+                    target = self.targets[position]
+                    targets[fill[target]] = source
+                    weights[fill[target]] = self.weights[position]
+                    fill[target] += 1
+            self._reverse = CSRGraph(self.names, offsets, targets, weights, self.index)
+            self._reverse._reverse = self
+        return self._reverse
+
+
+def _identity(node):
+    return node
+
+# Returns (neighbors, encode, decode) so the searches below can run on either
+# graph type: CSRGraph searches work on integer ids and only translate names
+# at the boundaries
+def _search_space(graph):
+    if isinstance(graph, CSRGraph):
+        return graph.neighbors, graph.index.__getitem__, graph.names.__getitem__
+    return graph.graph.__getitem__, _identity, _identity
+
+# Encodes a search target. A name missing from the graph becomes None, which
+# no search ever reaches, so an unknown goal gives no path on either graph type
+def _encode_target(graph, node, encode):
+    if isinstance(graph, CSRGraph):
+        return graph.index.get(node)
+    return encode(node)
+
+# Neighbors along incoming edges, for searches that run backwards from the goal
+def _reverse_neighbors(graph):
+    if isinstance(graph, CSRGraph):
+        return graph.reverse().neighbors
+    return graph.graph.__getitem__  # Graph is undirected
+
+# Wraps a neighbor function so every edge weight goes through edge_cost;
+# reverse neighbor functions list edges that point into node
+def _costed(neighbors, edge_cost, decode, reverse=False):
+    def costed_neighbors(node):
+        name = decode(node)
+        if reverse:
+            return [(neighbor, edge_cost(decode(neighbor), name, weight))
+                    for neighbor, weight in neighbors(node)]
+        return [(neighbor, edge_cost(name, decode(neighbor), weight))
+                for neighbor, weight in neighbors(node)]
+
+    return costed_neighbors
+
+# Heuristics are looked up by node name. Heuristic objects built for the same
+# CSRGraph (like landmarks.LandmarkHeuristic) can estimate straight from ids.
+def _heuristic_function(graph, heuristic, decode):
+    if isinstance(graph, CSRGraph) and getattr(heuristic, "names", None) is graph.names:
+        return heuristic.estimate
+    return lambda node: heuristic[decode(node)]
+
+# Rebuilds the path to goal by following predecessor pointers
+def _rebuild_path(parent, goal, decode):
+    path = []
+    node = goal
+    while node is not None:
+        path.append(decode(node))
+        node = parent[node]
+    path.reverse()
+    return path
+
+# BFS/DFS core: frontier entries carry their predecessor instead of a copy of
+# the whole path, and a node's predecessor is fixed when it is first expanded
+def _uninformed_search(neighbors, start, goal, breadth_first, stats):
+    parent = {}
+    frontier = deque([(start, None, 0)])  # (node, predecessor, cost)
+    pop = frontier.popleft if breadth_first else frontier.pop
+    expanded = relaxed = 0
+    peak = 1
+
+    while frontier:
+        current, previous, cost = pop()
+
+        if current in parent:
+            continue
+        parent[current] = previous
 
-# BFS implementation
-def bfs(graph, start, goal):
-    visited = set()
-    queue = deque([(start, [start])])
+        if current == goal:
+            break
 
-    while queue:
-        current, path = queue.popleft()
+        expanded += 1
+        successors = neighbors(current)
+        if breadth_first:
+            # Sort neighbors to maintain expected order
+            successors = sorted(successors)
+        for neighbor, weight in successors:
+            relaxed += 1
+            if neighbor not in parent:
+                frontier.append((neighbor, current, cost + weight))
+        if len(frontier) > peak:
+            peak = len(frontier)
+    else:
+        cost = None
+
+    stats.update(nodes_expanded=expanded, peak_frontier=peak, edges_relaxed=relaxed)
+    return parent, cost
+
+# One step of a GBFS or A* path, linked to the step before it. Steps compare like
+# the path lists the heap entries used to carry, so entries for the same node
+# and priority still break ties on the lexicographically smallest path.
+class _PathStep:
+    __slots__ = ("node", "previous", "depth")
+
+    def __init__(self, node, previous):
+        self.node = node
+        self.previous = previous
+        self.depth = 0 if previous is None else previous.depth + 1
+
+    def __lt__(self, other):
+        a, b = self, other
+        while a.depth > b.depth:
+            a = a.previous
+        while b.depth > a.depth:
+            b = b.previous
+        if a is b:
+            # One path is a prefix of the other
+            return self.depth < other.depth
+        # Both paths extend steps of expanded nodes, so they share a prefix
+        while a.previous is not b.previous:
+            a, b = a.previous, b.previous
+        return a.node < b.node
+
+# GBFS core. A node is pushed again from every expanded neighbor and keeps the
+# path of its first popped entry, so the returned path (and its cost) is the
+# one the original path-copying GBFS found.
+def _greedy_search(neighbors, start, goal, h, stats):
+    closed = {}  # node -> _PathStep it was expanded with
+    frontier = [(h(start), start, _PathStep(start, None), 0)]  # (h, node, path, cost)
+    expanded = relaxed = 0
+    peak = 1
+
+    while frontier:
+        _, current, path, cost = heapq.heappop(frontier)
+
+        if current in closed:
+            continue
+        closed[current] = path
 
         if current == goal:
-            return path
+            break
+
+        expanded += 1
+        for neighbor, weight in neighbors(current):
+            relaxed += 1
+            if neighbor not in closed:
+                heapq.heappush(frontier, (h(neighbor), neighbor, _PathStep(neighbor, path), cost + weight))
+        if len(frontier) > peak:
+            peak = len(frontier)
+    else:
+        cost = None
+
+    stats.update(nodes_expanded=expanded, peak_frontier=peak, edges_relaxed=relaxed)
+    parent = {}
+    if cost is not None:
+        step = closed[goal]
+        while step is not None:
+            parent[step.node] = step.previous.node if step.previous is not None else None
+            step = step.previous
+    return parent, cost
+
+# A* core: keeps the g-score and path of every open node, only pushes a node
+# again when its g-score improves (or, at equal g, its path sorts first, which
+# is the entry the original path-copying A* popped) and skips the stale heap
+# entries this leaves behind
+def _best_first_search(neighbors, start, goal, h, stats):
+    best = {start: 0}
+    paths = {start: _PathStep(start, None)}  # node -> _PathStep of its live entry
+    frontier = [(h(start), start, paths[start], 0)]  # (priority, node, path, cost)
+    expanded = relaxed = 0
+    peak = 1
+
+    while frontier:
+        _, current, path, cost = heapq.heappop(frontier)
+
+        if cost > best[current] or path is not paths[current]:
+            continue
 
-        if current not in visited:
-            visited.add(current)
-            # Sort neighbors to maintain expected order
-            for neighbor, _ in sorted(graph.graph[current]):
-                if neighbor not in visited:
-                    queue.append((neighbor, path + [neighbor]))
+        if current == goal:
+            break
+
+        expanded += 1
+        for neighbor, weight in neighbors(current):
+            relaxed += 1
+            new_cost = cost + weight
+            known = best.get(neighbor, float("inf"))
+            if new_cost < known:
+                step = _PathStep(neighbor, path)
+            elif new_cost == known:
+                step = _PathStep(neighbor, path)
+                if not step < paths[neighbor]:
+                    continue
+            else:
+                continue
+            best[neighbor] = new_cost
+            paths[neighbor] = step
+            heapq.heappush(frontier, (new_cost + h(neighbor), neighbor, step, new_cost))
+        best[current] = -1  # Closed: later entries for this node are stale
+        if len(frontier) > peak:
+            peak = len(frontier)
+    else:
+        cost = None
+
+    stats.update(nodes_expanded=expanded, peak_frontier=peak, edges_relaxed=relaxed)
+    parent = {}
+    if cost is not None:
+        step = paths[goal]
+        while step is not None:
+            parent[step.node] = step.previous.node if step.previous is not None else None
+            step = step.previous
+    return parent, cost
+
+# Bidirectional core: a forward search from start and a backward search from
+# goal over the same reduced costs w(u, v) - potential(u) + potential(v).
+# With potential = 0 this is bidirectional Dijkstra; with the average of the
+# forward and reverse heuristics it is bidirectional A*. Each side is keyed by
+# g + its own potential (forward: potential, backward: -potential), and the
+# search stops once the two smallest keys together reach the best meeting
+# cost found so far, which is then the shortest path.
+def _bidirectional_search(neighbors, reverse_neighbors, start, goal, potential, stats):
+    forward = {"successors": neighbors, "sign": 1, "parent": {start: None},
+               "best": {start: 0}, "closed": set(),
+               "frontier": [(potential(start), start, 0)]}  # (key, node, cost)
+    backward = {"successors": reverse_neighbors, "sign": -1, "parent": {goal: None},
+                "best": {goal: 0}, "closed": set(),
+                "frontier": [(-potential(goal), goal, 0)]}
+    best_cost, meeting = (0, start) if start == goal else (float("inf"), None)
+    expanded = relaxed = 0
+    peak = 2
+
+    while True:
+        # Drop stale and closed entries so both heap tops are live keys
+        for side in (forward, backward):
+            frontier = side["frontier"]
+            while frontier and (frontier[0][1] in side["closed"]
+                                or frontier[0][2] > side["best"][frontier[0][1]]):
+                heapq.heappop(frontier)
+        if not forward["frontier"] or not backward["frontier"]:
+            break
+        if forward["frontier"][0][0] + backward["frontier"][0][0] >= best_cost:
+            break
+
+        # Expand the side with the smaller frontier
+        if len(forward["frontier"]) <= len(backward["frontier"]):
+            side, other = forward, backward
+        else:
+            side, other = backward, forward
+        _, current, cost = heapq.heappop(side["frontier"])
+        side["closed"].add(current)
+        best, sign = side["best"], side["sign"]
+        expanded += 1
+
+        for neighbor, weight in side["successors"](current):
+            relaxed += 1
+            new_cost = cost + weight
+            if neighbor not in side["closed"] and new_cost < best.get(neighbor, float("inf")):
+                best[neighbor] = new_cost
+                side["parent"][neighbor] = current
+                heapq.heappush(side["frontier"], (new_cost + sign * potential(neighbor), neighbor, new_cost))
+            if neighbor in other["best"] and best[neighbor] + other["best"][neighbor] < best_cost:
+                best_cost, meeting = best[neighbor] + other["best"][neighbor], neighbor
+
+        peak = max(peak, len(forward["frontier"]) + len(backward["frontier"]))
+
+    stats.update(nodes_expanded=expanded, peak_frontier=peak, edges_relaxed=relaxed)
+    if meeting is None:
+        return None, None, None, None
+    return forward["parent"], backward["parent"], meeting, best_cost
+
+# Shared search core used by bfs, dfs, gbfs, a_star and the bidirectional
+# searches. Returns (path, cost, stats) where stats holds nodes_expanded,
+# peak_frontier and edges_relaxed; path and cost are None when goal is
+# unreachable. edge_cost(node1, node2, weight), if given, replaces the weight
+# of every edge node1 -> node2 the search relaxes.
+def search(graph, start, goal, algorithm, heuristic=None, reverse_heuristic=None, edge_cost=None):
+    neighbors, encode, decode = _search_space(graph)
+    if edge_cost is not None:
+        neighbors = _costed(neighbors, edge_cost, decode)
+    start, goal = encode(start), _encode_target(graph, goal, encode)
+    stats = {}
+
+    if algorithm in ("bfs", "dfs"):
+        parent, cost = _uninformed_search(neighbors, start, goal, algorithm == "bfs", stats)
+    elif algorithm == "gbfs":
+        parent, cost = _greedy_search(neighbors, start, goal, _heuristic_function(graph, heuristic, decode), stats)
+    elif algorithm == "a_star":
+        parent, cost = _best_first_search(neighbors, start, goal, _heuristic_function(graph, heuristic, decode), stats)
+    elif algorithm in ("bidirectional_dijkstra", "bidirectional_a_star"):
+        if algorithm == "bidirectional_a_star":
+            # Average potential: consistent for both directions whenever the
+            # forward and reverse heuristics are consistent
+            h = _heuristic_function(graph, heuristic, decode)
+            if reverse_heuristic is None:
+                potential = lambda node: h(node) / 2
+            else:
+                h_reverse = _heuristic_function(graph, reverse_heuristic, decode)
+                potential = lambda node: (h(node) - h_reverse(node)) / 2
+        else:
+            potential = lambda node: 0
+        if goal is None or isinstance(graph, Graph) and goal not in graph.graph:
+            # The backward search has nowhere to start from
+            stats.update(nodes_expanded=0, peak_frontier=0, edges_relaxed=0)
+            return None, None, stats
+        reverse_neighbors = _reverse_neighbors(graph)
+        if edge_cost is not None:
+            reverse_neighbors = _costed(reverse_neighbors, edge_cost, decode, reverse=True)
+        parent, reverse_parent, meeting, cost = _bidirectional_search(
+            neighbors, reverse_neighbors, start, goal, potential, stats)
+        if cost is None:
+            return None, None, stats
+        path = _rebuild_path(parent, meeting, decode)
+        path.extend(reversed(_rebuild_path(reverse_parent, meeting, decode)[:-1]))
+        return path, cost, stats
+    else:
+        raise ValueError(f"unknown algorithm {algorithm!r}")
+
+    if cost is None:
+        return None, None, stats
+    return _rebuild_path(parent, goal, decode), cost, stats
 
-    return None
+# BFS implementation
+def bfs(graph, start, goal):
+    return search(graph, start, goal, "bfs")[0]
 
 
 # DFS implementation
 def dfs(graph, start, goal):
-    visited = set()
-    stack = [(start, [start])]
-
-    while stack:
-        current, path = stack.pop()
-
-        if current == goal:
-            return path
-
-        if current not in visited:
-            visited.add(current)
-            for neighbor, _ in graph.graph[current]:
-                if neighbor not in visited:
-                    stack.append((neighbor, path + [neighbor]))
-
-    return None
+    return search(graph, start, goal, "dfs")[0]
 
 # GBFS implementation
 def gbfs(graph, start, goal, heuristic):
-    visited = set()
-    priority_queue = [(heuristic[start], start, [start])]
-
-    while priority_queue:
-        _, current, path = heapq.heappop(priority_queue)
-
-        if current == goal:
-            return path
-
-        if current not in visited:
-            visited.add(current)
-            for neighbor, _ in graph.graph[current]:
-                if neighbor not in visited:
-                    heapq.heappush(priority_queue, (heuristic[neighbor], neighbor, path + [neighbor]))
-
-    return None
+    return search(graph, start, goal, "gbfs", heuristic)[0]
 
 # A* Search implementation
 def a_star(graph, start, goal, heuristic):
-    visited = set()
-    priority_queue = [(0, start, [start], 0)]  # (priority, node, path, cost)
-
-    while priority_queue:
-        _, current, path, cost = heapq.heappop(priority_queue)
-
-        if current == goal:
-            return path
-
-        if current not in visited:
-            visited.add(current)
-            for neighbor, weight in graph.graph[current]:
-                if neighbor not in visited:
-                    new_cost = cost + weight
-                    priority = new_cost + heuristic[neighbor]
-                    heapq.heappush(priority_queue, (priority, neighbor, path + [neighbor], new_cost))
-
-    return None
+    return search(graph, start, goal, "a_star", heuristic)[0]
+
+# Bidirectional Dijkstra implementation
+def bidirectional_dijkstra(graph, start, goal):
+    return search(graph, start, goal, "bidirectional_dijkstra")[0]
+
+# Bidirectional A* implementation; reverse_heuristic estimates the distance
+# back to start and defaults to 0
+def bidirectional_a_star(graph, start, goal, heuristic, reverse_heuristic=None):
+    return search(graph, start, goal, "bidirectional_a_star", heuristic, reverse_heuristic)[0]
+
+# One-to-many Dijkstra: settles nodes from source until every target is
+# settled (or everything reachable is, when targets is None).
+# Returns (dist, parent) holding final distances for all settled nodes.
+def _dijkstra(neighbors, source, targets=None):
+    dist = {source: 0}
+    parent = {source: None}
+    settled = set()
+    remaining = None if targets is None else set(targets)
+    frontier = [(0, source)]
+
+    while frontier:
+        cost, current = heapq.heappop(frontier)
+        if current in settled:
+            continue
+        settled.add(current)
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+        for neighbor, weight in neighbors(current):
+            new_cost = cost + weight
+            if new_cost < dist.get(neighbor, float("inf")):
+                dist[neighbor] = new_cost
+                parent[neighbor] = current
+                heapq.heappush(frontier, (new_cost, neighbor))
+
+    for node in list(dist):
+        if node not in settled:
+            del dist[node]
+    return dist, parent
+
+# Row of the route matrix for one origin: costs (inf when unreachable) and,
+# if requested, the paths to every destination
+def _route_row(graph, origin, destinations, with_paths):
+    neighbors, encode, decode = _search_space(graph)
+    targets = [_encode_target(graph, destination, encode) for destination in destinations]
+    dist, parent = _dijkstra(neighbors, encode(origin), targets)
+    costs = [dist.get(target, float("inf")) for target in targets]
+    if not with_paths:
+        return costs, None
+    paths = [_rebuild_path(parent, target, decode) if target in dist else None
+             for target in targets]
+    return costs, paths
+
+# Worker processes get the graph once through the pool initializer (inherited
+# without pickling under fork), so tasks only carry origin names
+_worker_graph = None
+
+def _init_worker(graph):
+    global _worker_graph
+    _worker_graph = graph
+
+def _route_rows(origins, destinations, with_paths):
+    return [_route_row(_worker_graph, origin, destinations, with_paths) for origin in origins]
+
+# Many-to-many routing: one one-to-many Dijkstra per distinct origin, spread
+# over a process pool. Returns (costs, paths) where costs[i][j] is the cost
+# from origins[i] to destinations[j] and paths is None unless with_paths.
+def route_matrix(graph, origins, destinations, with_paths=False, processes=None, chunk_size=None):
+    origins, destinations = list(origins), list(destinations)
+    unique = list(dict.fromkeys(origins))
+    processes = processes or os.cpu_count() or 1
+    processes = min(processes, len(unique))
+
+    if processes <= 1:
+        rows = [_route_row(graph, origin, destinations, with_paths) for origin in unique]
+    else:
+        chunk_size = chunk_size or max(1, len(unique) // (processes * 4))
+        chunks = [unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)]
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(graph,)) as pool:
+            rows = [row
+                    for chunk_rows in pool.map(_route_rows, chunks,
+                                               [destinations] * len(chunks),
+                                               [with_paths] * len(chunks))
+                    for row in chunk_rows]
+
+    by_origin = dict(zip(unique, rows))
+    costs = [by_origin[origin][0] for origin in origins]
+    paths = [by_origin[origin][1] for origin in origins] if with_paths else None
+    return costs, paths
+
+# Bounded LRU cache of search results for one graph. Entries are dropped as
+# soon as the graph's version changes, and when either max_entries or
+# (approximately) max_bytes is exceeded the least recently used ones go first.
+# Heuristics are matched by identity: each entry keeps its heuristic alive, so
+# its id cannot be reused by another object while the entry exists. Changing
+# a heuristic dict in place is not noticed; clear() the cache or pass a new
+# dict instead. Bytes count each entry's path with its node names, and each
+# heuristic once while any entry holds it (a dict with its keys and values,
+# other objects as sys.getsizeof reports them).
+class RouteCache:
+    ENTRY_OVERHEAD = 200  # Rough bytes per entry besides the path
+
+    def __init__(self, graph, max_entries=4096, max_bytes=None):
+        self.graph = graph
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (path, cost, size, heuristic)
+        self.held = {}  # id(heuristic) -> [heuristic, entries holding it, size]
+        self.bytes = 0
+        self.version = graph.version
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def lookup(self, start, goal, algorithm="a_star", heuristic=None):
+        """Returns (path, cost), running search() only on a miss."""
+        if self.graph.version != self.version:
+            self.invalidations += len(self.entries)
+            self.clear()
+            self.version = self.graph.version
+
+        # Heuristic objects are keyed by identity: dicts are not hashable
+        key = (start, goal, algorithm, id(heuristic))
+        entry = self.entries.get(key)
+        if entry is not None and entry[3] is heuristic:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0], entry[1]
+
+        self.misses += 1
+        path, cost, _ = search(self.graph, start, goal, algorithm, heuristic)
+        size = self.ENTRY_OVERHEAD + sys.getsizeof(path)
+        if path is not None:
+            size += sum(map(sys.getsizeof, path))
+        if entry is not None:
+            self._release(entry)
+        self.entries[key] = (path, cost, size, heuristic)
+        self.entries.move_to_end(key)
+        self.bytes += size
+        self._hold(heuristic)
+        while self.entries and (len(self.entries) > self.max_entries
+                                or self.max_bytes is not None and self.bytes > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            self._release(evicted)
+            self.evictions += 1
+        return path, cost
+
+    def _hold(self, heuristic):
+        if heuristic is None:
+            return
+        held = self.held.get(id(heuristic))
+        if held is None:
+            size = sys.getsizeof(heuristic)
+            if isinstance(heuristic, dict):
+                size += sum(map(sys.getsizeof, heuristic)) + sum(map(sys.getsizeof, heuristic.values()))
+            held = self.held[id(heuristic)] = [heuristic, 0, size]
+            self.bytes += size
+        held[1] += 1
+
+    def _release(self, entry):
+        self.bytes -= entry[2]
+        heuristic = entry[3]
+        if heuristic is None:
+            return
+        held = self.held[id(heuristic)]
+        held[1] -= 1
+        if held[1] == 0:
+            del self.held[id(heuristic)]
+            self.bytes -= held[2]
+
+    def route(self, start, goal, algorithm="a_star", heuristic=None):
+        """Returns only the path, like the search functions."""
+        return self.lookup(start, goal, algorithm, heuristic)[0]
+
+    def clear(self):
+        self.entries.clear()
+        self.held.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+        }
 
 # Evaluate performance of algorithms
 def evaluate_algorithms(graph, start, goal, heuristic):
@@ -101,17 +679,19 @@ def evaluate_algorithms(graph, start, goal, heuristic):
         "BFS": bfs,
         "DFS": dfs,
         "GBFS": gbfs,
-        "A*": a_star
+        "A*": a_star,
+        "Bidirectional Dijkstra": bidirectional_dijkstra,
+        "Bidirectional A*": bidirectional_a_star
     }
 
     results = {}
     for name, algorithm in algorithms.items():
-        start_time = time.time()
-        if name in ["GBFS", "A*"]:
+        start_time = time.perf_counter()
+        if name in ["GBFS", "A*", "Bidirectional A*"]:
             path = algorithm(graph, start, goal, heuristic)
         else:
             path = algorithm(graph, start, goal)
-        runtime = time.time() - start_time
+        runtime = time.perf_counter() - start_time
         results[name] = (path, runtime)
 
     return results
@@ -0,0 +1,30 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark import GENERATORS
+from landmarks import Landmarks
+from route_service import RouteService
+from routeplanning import search
+
+
+def test_injected_executor():
+    graph, _ = GENERATORS["grid"](400, 0)
+    landmarks = Landmarks.build(graph, count=4)
+    service = RouteService(graph, executor=ThreadPoolExecutor(2), heuristics={"landmarks": landmarks.heuristic})
+    start, goal = graph.names[0], graph.names[-1]
+
+    async def run():
+        return await asyncio.gather(
+            service.route(start, goal, "a_star", "landmarks"),
+            service.route(start, goal, "bidirectional_dijkstra"),
+        )
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        service.close()
+    expected = search(graph, start, goal, "bidirectional_dijkstra")[1]
+    for path, cost in results:
+        assert path[0] == start and path[-1] == goal
+        assert abs(cost - expected) < 1e-9
+    assert service.stats()["coalesced"] == 0